@@ -1,6 +1,7 @@
 import streamlit as st
-import json
-from pathlib import Path
+
+from utils.catalog import PIPELINE_SECTIONS, create_application, is_valid_name, refresh_catalog, search_catalog
+from utils.storage import summary_path
 
 st.set_page_config(page_title="Patent Analysis Tool", layout="wide")
 
@@ -42,29 +43,39 @@ st.sidebar.markdown(
 st.title("Patent Analysis Tool")
 
 # File Selection
-filename = st.text_input("Enter file name:")
-filename = filename.upper()                             # Ensure uppercase input
+catalog = refresh_catalog()
 
-if filename:
-    st.session_state["filename"] = filename  # Store in session state 
-    directory = Path(f"data/{filename}")
-    directory.mkdir(parents=True, exist_ok=True)
+query = st.text_input("Filter by name, classes or keywords:")
+names = search_catalog(catalog, query)
+
+def describe(name):
+    entry = catalog[name]
+    details = [entry["date"], entry["classes"], f"{len(entry['sections'])}/{len(PIPELINE_SECTIONS)} steps"]
+    return " | ".join([name] + [detail for detail in details if detail])
 
-    file_path = directory / f"Summary_{filename}.json"
+filename = st.selectbox(
+    f"Open application ({len(names)} of {len(catalog)}):", names, index=None,
+    format_func=describe, placeholder="Type to search ...",
+)
 
-    if file_path.exists():
-        with open(file_path, "r") as f:
-            data = json.load(f)
-    else:
-        data = {}
-        with open(file_path, "w") as f:
-            json.dump(data, f)
+with st.expander("New application"):
+    with st.form("new_application"):
+        new_name = st.text_input("File name").strip().upper()       # Ensure uppercase input
+        create = st.form_submit_button("Create")
+    if create:
+        if not is_valid_name(new_name):
+            st.error("Use letters, digits, '.', '_' or '-' only.")
+        elif not create_application(new_name):
+            st.error(f"{new_name} already exists.")
+        else:
+            filename = new_name
 
-    st.success(f"Loaded file: {file_path}")
+if filename:
+    st.session_state["filename"] = filename  # Store in session state
+    st.success(f"Loaded file: {summary_path(filename)}")
 
     # Redirect to General page
     st.switch_page("pages/1_General.py")
 
 else:
-    st.warning("Please enter a file name.")
-
+    st.warning("Please select or create an application.")
@@ -1,9 +1,14 @@
 import streamlit as st
-import json
 from pathlib import Path
-from PIL import Image
 from datetime import datetime
 
+from utils.analytics import split_classes, sync_application
+from utils.autosave import get_autosave
+from utils.images import ensure_derivatives, process_uploaded_image
+from utils.session_cache import get_app_cache
+from utils.storage import update_sections
+from utils.suggestions import split_keywords, suggest, update_suggestions
+
 # Configure Streamlit
 st.set_page_config(layout="wide")
 
@@ -20,16 +25,6 @@ directory = Path(f"data/{filename}")
 directory.mkdir(parents=True, exist_ok=True)  # Ensure directory exists
 file_path = directory / f"Summary_{filename}.json"
 
-# Load existing data
-if file_path.exists():
-    with open(file_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-else:
-    data = {}
-
-# Initialize session state for general data
-st.session_state.setdefault("gen_data", data)
-
 # Define input placeholders
 PLACEHOLDERS = {
     "Independent Claims": "Claim 1 discloses ...",
@@ -42,6 +37,27 @@ PLACEHOLDERS = {
     "Remarks": "Consulted: ...",
     "Prior Art": "Enter prior art information..."
 }
+GENERAL_FIELDS = list(PLACEHOLDERS) + ["Nr. Claims", "Appl. Image", "Date"]
+
+# Fields with suggestions from the archive: field -> (co-occurrence matrix, parser of the field)
+SUGGESTED_FIELDS = {"Keywords": ("keywords", split_keywords), "Classes": ("classes", split_classes)}
+
+
+def add_suggestion(input_key: str, pills_key: str) -> None:
+    """Appends the clicked suggestion to its text field."""
+    picked = st.session_state[pills_key]
+    if picked:
+        current = st.session_state[input_key].strip().rstrip(",")
+        st.session_state[input_key] = f"{current}, {picked}" if current else picked
+    st.session_state[pills_key] = None
+
+# General data of this application only, cached per application name
+app_cache = get_app_cache(filename)
+if "gen_data" not in app_cache.state:
+    app_cache.state["gen_data"] = app_cache.sections(GENERAL_FIELDS)
+gen_data = app_cache.state["gen_data"]
+autosaved = app_cache.state.setdefault("gen_autosaved", dict(gen_data))  # What the file already holds
+features = [feature for claim_features in app_cache.section("Edited Feature Table", {}).values() for feature in claim_features]
 
 # Create layout
 col_general, col_claims, col_image = st.columns([0.3, 0.3, 0.3])
@@ -50,20 +66,31 @@ col_general, col_claims, col_image = st.columns([0.3, 0.3, 0.3])
 with col_general:
     st.subheader("General")
     for key, placeholder in PLACEHOLDERS.items():
-        st.session_state["gen_data"][key] = st.text_area(
+        # Initial value through the session state, which the suggestions also write to
+        st.session_state.setdefault(f"input_{filename}_{key}", gen_data.get(key, ""))
+        gen_data[key] = st.text_area(
             key,
-            value=st.session_state["gen_data"].get(key, ""),
-            key=f"input_{key}",
+            key=f"input_{filename}_{key}",
             placeholder=placeholder
         )
+        if key in SUGGESTED_FIELDS and features:
+            kind, split = SUGGESTED_FIELDS[key]
+            suggested = suggest(filename, features, kind, exclude=split(gen_data[key]))
+            if suggested:
+                st.pills(
+                    f"Suggested {key.lower()}", [term for term, _ in suggested],
+                    key=f"suggest_{filename}_{key}",
+                    on_change=add_suggestion, args=(f"input_{filename}_{key}", f"suggest_{filename}_{key}"),
+                    help="Saved with the features of this application in other applications"
+                )
 
 # Claims Input
 with col_claims:
     st.subheader("Claims")
-    st.session_state["gen_data"]["Nr. Claims"] = st.text_input(
+    gen_data["Nr. Claims"] = st.text_input(
         "Number of claims",
-        value=st.session_state["gen_data"].get("Nr. Claims", ""),
-        key="nr_claims",
+        value=gen_data.get("Nr. Claims", ""),
+        key=f"nr_claims_{filename}",
         placeholder="Enter number of claims..."
     )
 
@@ -71,23 +98,38 @@ with col_claims:
 with col_image:
     st.subheader("Appl. Image")
     uploaded_image = st.file_uploader("Upload an Image (PNG, JPG, JPEG)", type=["png", "jpg", "jpeg"])
-    image_path = directory / f"appl_image_{filename}.png"
 
     if uploaded_image:
-        with open(image_path, "wb") as img_file:
-            img_file.write(uploaded_image.getbuffer())
-        st.session_state["gen_data"]["Appl. Image"] = str(image_path)
-        st.image(uploaded_image, caption="Uploaded Image", use_container_width=True)
-    elif "Appl. Image" in st.session_state["gen_data"]:
+        # Decode and build the derivatives only once per upload, not on every rerun
+        if st.session_state.get("processed_image_id") != uploaded_image.file_id:
+            try:
+                image_paths = process_uploaded_image(uploaded_image, directory, filename)
+                gen_data["Appl. Image"] = str(image_paths["original"])
+                st.session_state["processed_image_id"] = uploaded_image.file_id
+            except Exception as e:
+                st.error(f"Error processing image: {e}")
+
+    if "Appl. Image" in gen_data:
         try:
-            image = Image.open(st.session_state["gen_data"]["Appl. Image"])
-            st.image(image, caption="Application Image", use_container_width=True)
+            image_paths = ensure_derivatives(directory, filename)
+            if image_paths:
+                st.image(str(image_paths["thumb"]), caption="Application Image", use_container_width=True)
         except Exception as e:
             st.error(f"Error loading image: {e}")
 
+# Autosave changed fields in the background, so switching pages loses nothing
+changes = {key: value for key, value in gen_data.items() if autosaved.get(key, "") != value}
+if changes:
+    get_autosave().submit(filename, changes)
+    autosaved.update(changes)
+
 # Save Data Function
 if st.button("Save", type="primary", use_container_width=True):
-    st.session_state["gen_data"]["Date"] = datetime.now().strftime("%d-%m-%Y")
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(st.session_state["gen_data"], f, indent=4)
+    gen_data["Date"] = datetime.now().strftime("%d-%m-%Y")
+    get_autosave().flush(filename)  # Pending background writes go first
+
+    # Merge into the current file so sections saved by other pages are kept
+    update_sections(filename, gen_data)
+    sync_application(filename)                      # Date and Classes are part of every analytics row
+    update_suggestions(filename)
     st.success(f"Data successfully saved to {file_path}")
@@ -1,26 +1,32 @@
 import streamlit as st
-import json
 import networkx as nx
-from pathlib import Path
 import pandas as pd
 from pyvis.network import Network
 import tempfile
 from itertools import cycle
 from rapidfuzz import process  # Fast fuzzy matching
 
+from utils.autosave import get_autosave
+from utils.features import concatenated_frame
+from utils.graph import claims_by_color, cluster_label, create_graph, graph_from_network, level_of_detail, network_section, pack_graph, unpack_graph
+from utils.graph_index import related_applications, update_application
+from utils.precompute import get_scheduler, provisional_section
+from utils.session_cache import get_app_cache
+from utils.storage import update_sections
+from utils.vocabulary import load_vocabulary
+
 # Constants
-COLORS = ["red", "orange", "lime", "turquoise", "hotpink", "khaki", "blue", "green", "yellow", "violet", "coral", "pink", "steelblue", "salmon", "tomato", "springgreen"] * 10
+LOD_THRESHOLD = 150         # Graphs with more nodes start in level-of-detail mode
 
 # Helper functions for graph-related operations
-def load_existing_data(filename):
-    directory = Path(f"data/{filename}")
-    directory.mkdir(parents=True, exist_ok=True)  # Ensure directory exists
-    file_path = directory / f"Summary_{filename}.json"
-    
-    if file_path.exists():
-        with open(file_path, "r", encoding="utf-8") as f:
-            return json.load(f), file_path
-    return {}, file_path
+def store_graph(app_cache, G):
+    """Keeps the edited graph in the per-application cache in packed form."""
+    app_cache.state["graph"] = pack_graph(G)
+
+def autosave_graph(app_cache, G):
+    """Keeps an edited graph and saves it in the background."""
+    store_graph(app_cache, G)
+    get_autosave().submit(app_cache.filename, {"Network": network_section(G)})
 
 def find_best_match(target, candidates):
     if not candidates:
@@ -80,71 +86,6 @@ def create_graph_new(df):
     
     return G
 
-def create_graph(df):
-    G = nx.DiGraph()
-    
-    color_cycle = cycle([
-        "red", "orange", "lime", "turquoise", "hotpink", "khaki", "blue", 
-        "green", "yellow", "violet", "coral", "pink", "steelblue", "salmon", 
-        "tomato", "springgreen"
-    ])
-    
-    # Assign colors based on first appearance in 'a_list'
-    node_colors = {}
-    claim_colors = {}
-    
-    for idx, row in df.iterrows():
-        node = row['a_list']
-        claim = row['Cl_nr']
-        
-        if pd.notna(node) and node.strip():
-            if node not in node_colors:
-                if claim not in claim_colors:
-                    claim_colors[claim] = next(color_cycle)
-                node_colors[node] = claim_colors[claim]
-
-    # Add nodes with their assigned colors
-    for node, color in node_colors.items():
-        G.add_node(node, color=color)
-    
-    # Add edges based on both old and new logic
-    for i in range(len(df) - 2):
-        node_a = None
-        node_b = None
-        edge_label = df.at[i + 1, 'prep_list'] if pd.notna(df.at[i + 1, 'prep_list']) else ""
-        
-        # Condition (a): 'a_list[i]' is a string, 'the_list[i+2]' is empty, 'a_list[i+2]' is a string
-        if pd.notna(df.at[i, 'a_list']) and df.at[i, 'a_list'].strip():
-            if pd.isna(df.at[i + 2, 'the_list']) or not df.at[i + 2, 'the_list'].strip():
-                if pd.notna(df.at[i + 2, 'a_list']) and df.at[i + 2, 'a_list'].strip():
-                    node_a = df.at[i, 'a_list']
-                    node_b = df.at[i + 2, 'a_list']
-        
-        # Condition (b): 'the_list[i]' is a string, 'a_list[i+2]' is a string
-        elif pd.notna(df.at[i, 'the_list']) and df.at[i, 'the_list'].strip():
-            if pd.notna(df.at[i + 2, 'a_list']) and df.at[i + 2, 'a_list'].strip():
-                node_a = next((n for n in df['a_list'] if n == df.at[i, 'the_list']), None)
-                node_b = df.at[i + 2, 'a_list']
-        
-        if node_a and node_b:
-            G.add_edge(node_a, node_b, label=edge_label)
-
-    # Identify the first node in a_list (assuming it's the first non-empty string)
-    first_node = next((node for node in df['a_list'] if pd.notna(node) and node.strip()), None)
-
-    # Connect first node to other nodes in 'a_list' if no edge exists in 'the_list'
-    if first_node:
-        for node in df['a_list']:
-            if node and node != first_node:
-                has_edge = any(G.has_edge(node, other) for other in df['the_list'])
-                if not has_edge:
-                    G.add_edge(first_node, node)
-
-    # Ensure all nodes have a subset attribute (default to 0 if missing)
-    nx.set_node_attributes(G, {node: 0 for node in G.nodes}, "subset")
-
-    return G
-
 def display_pyvis_graph(G):
     """Create an interactive Pyvis graph ensuring each node appears only once and retains its first assigned color."""
     net = Network(notebook=False)
@@ -153,53 +94,82 @@ def display_pyvis_graph(G):
         if isinstance(node, (str, int)):  # Ensure valid node type
             # Use the color from the node's attributes directly
             color = attrs.get("color", "lightblue")  # Default to lightblue if no color is found
-            net.add_node(str(node), label=str(node), color=color)
+            if attrs.get("cluster"):
+                # Collapsed nodes of one claim color: bigger box, members listed on hover
+                members = attrs["members"]
+                title = "\n".join(members[:30]) + ("\n..." if len(members) > 30 else "")
+                net.add_node(str(node), label=attrs["label"], color=color, shape="box", title=title,
+                             value=len(members))
+            else:
+                net.add_node(str(node), label=str(node), color=color)
 
     for edge in G.edges(data=True):
         if isinstance(edge[0], (str, int)) and isinstance(edge[1], (str, int)):
-            net.add_edge(str(edge[0]), str(edge[1]), title=edge[2].get("label", ""))
+            count = edge[2].get("count", 1)
+            title = edge[2].get("label", "") if count == 1 else f"{count} edges"
+            net.add_edge(str(edge[0]), str(edge[1]), title=title, value=count)
 
     return net
 
-def save_network(G, file_path):
+def save_network(G, filename):
     if "" in G.nodes:
         G.remove_node("")
 
-    # Prepare network data
-    network_data = {
-        "nodes": [{"id": node, "color": G.nodes[node].get("color", "lightblue")} for node in G.nodes],
-        "edges": [{"source": edge[0], "target": edge[1], "label": G.edges[edge].get("label", "")} for edge in G.edges],
-    }
-
-    # Ensure correct JSON structure
-    data = {}
-    if file_path.exists():
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-        except json.JSONDecodeError:
-            data = {}  # Reset if the JSON is corrupted
+    file_path = update_sections(filename, {"Network": network_section(G)})
 
-    data["Network"] = network_data
-
-    # Debugging: Print JSON before saving
-    print(json.dumps(data, indent=4))
-
-    # Write updated JSON
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4)
+    # Keep the cross-application structure index up to date
+    update_application(filename, G)
+    get_scheduler().schedule(filename)  # Markers and Word summary of the saved network in the background
 
     st.success(f"Graph saved successfully to {file_path}")
 
-def display_color_legend(num_claims):
+def color_claims(app_cache, df):
+    """Claims per node color, computed once per graph and kept with it."""
+    if "claims_by_color" not in app_cache.state:
+        app_cache.state["claims_by_color"] = claims_by_color(df, load_vocabulary(app_cache.filename))
+    return app_cache.state["claims_by_color"]
+
+def display_color_legend(claims):
     st.subheader("Claim Color Legend")
-    for i in range(num_claims):
-        st.markdown(
-            f'<span style="color: {COLORS[i]}; font-weight: bold;">■ Claim {i+1}</span>',
-            unsafe_allow_html=True
+    # One markdown call for the whole legend, one entry per color of create_graph
+    st.markdown(
+        "&nbsp;&nbsp; ".join(
+            f'<span style="color: {color}; font-weight: bold;">■ {cluster_label(color, claims)}</span>'
+            for color in claims
+        ),
+        unsafe_allow_html=True
+    )
+
+def display_level_of_detail(G, filename, claims):
+    """Returns the graph to draw: the full graph or, for large graphs, a clustered view."""
+    lod = st.toggle("Level of detail", value=len(G) > LOD_THRESHOLD, key=f"lod_{filename}",
+                    help="Collapse the less connected nodes of each claim color into a cluster")
+    if not lod:
+        return G
+
+    col_nodes, col_expand = st.columns([1, 3])
+    with col_nodes:
+        max_nodes = st.number_input("Nodes shown", min_value=10, max_value=max(10, len(G)),
+                                    value=min(LOD_THRESHOLD, max(10, len(G))), step=10, key=f"lod_nodes_{filename}")
+    colors = sorted({color for _, color in G.nodes(data="color", default="lightblue")})
+    with col_expand:
+        expanded = st.multiselect("Expand clusters", colors, key=f"lod_expand_{filename}",
+                                  format_func=lambda color: f"{cluster_label(color, claims)} ({color})")
+    return level_of_detail(G, max_nodes, set(expanded))
+
+def display_related_applications(G, filename):
+    """Lists past applications that share feature sub-structures with this graph."""
+    with st.expander("Related applications (shared sub-structures)"):
+        related = related_applications(G, exclude=filename)
+        if not related:
+            st.write("No application shares a sub-structure with this graph.")
+            return
+        st.dataframe(
+            pd.DataFrame(related, columns=["Application", "Shared sub-structures", "Similarity"]),
+            hide_index=True,
         )
 
-def display_graph_controls(G):
+def display_graph_controls(G, app_cache):
     st.markdown("<br>", unsafe_allow_html=True)
     st.subheader("Modify Graph")
     st.markdown("<br>", unsafe_allow_html=True)
@@ -218,12 +188,12 @@ def display_graph_controls(G):
     if add_node_submit and new_node:
         if new_node not in G.nodes:
             G.add_node(new_node, color="yellow")  # Highlight new nodes in yellow
-            st.session_state["G"] = G  # Persist changes
+            autosave_graph(app_cache, G)  # Persist changes
             st.rerun()
 
     if del_node_submit and node_to_delete:
         G.remove_node(node_to_delete)
-        st.session_state["G"] = G  # Persist changes
+        autosave_graph(app_cache, G)  # Persist changes
         st.rerun()
 
     # Add Edge & Delete Edge
@@ -243,43 +213,15 @@ def display_graph_controls(G):
 
     if add_edge_submit and edge_node1 and edge_node2:
         G.add_edge(edge_node1, edge_node2, label=edge_label)
-        st.session_state["G"] = G  # Persist changes
+        autosave_graph(app_cache, G)  # Persist changes
         st.rerun()
 
     if del_edge_submit and edge_to_delete:
         u, v = edge_to_delete.split(" -> ")
         G.remove_edge(u, v)
-        st.session_state["G"] = G  # Persist changes
+        autosave_graph(app_cache, G)  # Persist changes
         st.rerun()
 
-def concatatened_dataframe(data):
-    rows = []
-
-    # Iterate through each claim in the "data" dictionary
-    for claim_key, claim_data in data.items():
-        a_list = data['a_list']
-        prep_list = data['prep_list']
-        the_list = data['the_list']
-        cl_nr_list = data['Cl_nr']
-        
-        # Determine the maximum length for lists
-        max_len = max(len(a_list), len(prep_list), len(the_list))
-        
-        # Pad the lists to make them the same length
-        a_list += [''] * (max_len - len(a_list))
-        prep_list += [''] * (max_len - len(prep_list))
-        the_list += [''] * (max_len - len(the_list))
-        cl_nr_list += [''] * (max_len - len(cl_nr_list))    
-        
-        # Add rows for each claim
-        for i in range(max_len):
-            rows.append([i, a_list[i], prep_list[i], the_list[i], cl_nr_list[i]])
-    
-    # Create a DataFrame
-    df = pd.DataFrame(rows, columns=['index', 'a_list', 'prep_list', 'the_list', 'Cl_nr'])
-    #st.dataframe(df)
-    return df
-
 def main():
     
     if "filename" not in st.session_state:
@@ -287,48 +229,67 @@ def main():
         st.stop()
 
     filename = st.session_state["filename"]
-    data, file_path = load_existing_data(filename)
-    network_features = data.get("Concatenated DataFrame", {})
+    app_cache = get_app_cache(filename)
+    network_features = app_cache.section("Concatenated DataFrame", {})
 
     # Generate concatenated dataframe
     if isinstance(network_features, dict):
-        df = concatatened_dataframe(network_features)
+        df = concatenated_frame(network_features)
     else:
         st.error("Invalid data format: network_features should be a dictionary.")
 
     st.title(f"Network Graph for {filename}")
-
-    # Display color legend
-    display_color_legend(len(network_features))
+    # Results prepared after the last save are not used if that failed
+    if error := get_scheduler().error(filename):
+        st.warning(f"Preparing this page in the background failed: {error}")
 
     # Create or load graph
-    if "G" not in st.session_state:
-        if "Network" in data:
+    if "graph" not in app_cache.state:
+        network = app_cache.section("Network")
+        if network:
             # Reconstruct graph from saved JSON
             G = nx.DiGraph()
-            for node in data["Network"]["nodes"]:
+            for node in network["nodes"]:
                 G.add_node(node["id"], color=node.get("color", "lightblue"))
-            for edge in data["Network"]["edges"]:
+            for edge in network["edges"]:
                 G.add_edge(edge["source"], edge["target"], label=edge.get("label", ""))
-            st.session_state["G"] = G
         else:
-            G = create_graph(df)
-            st.session_state["G"] = G
+            scheduler = get_scheduler()
+            if scheduler.pending(filename, "Network"):
+                with st.spinner("Finishing the graph started when the claims were saved..."):
+                    scheduler.wait(filename, "Network")
+            vocabulary = load_vocabulary(filename)
+            provisional = provisional_section(filename, "Network", network_features)
+            if provisional is not None:
+                G = graph_from_network(provisional)
+                for node in G.nodes:
+                    vocabulary.intern(node)
+            else:
+                G = create_graph(df, vocabulary)
+            vocabulary.save()
+        store_graph(app_cache, G)
     else:
-        G = st.session_state["G"]
+        G = unpack_graph(app_cache.state["graph"])
+
+    # Display color legend, one entry per claim color
+    claims = color_claims(app_cache, df)
+    display_color_legend(claims)
 
     # Display the network graph
-    net = display_pyvis_graph(G)
+    net = display_pyvis_graph(display_level_of_detail(G, filename, claims))
     temp_path = tempfile.NamedTemporaryFile(delete=False, suffix=".html").name
     net.save_graph(temp_path)
     st.components.v1.html(open(temp_path, "r", encoding="utf-8").read(), height=500)
 
+    display_related_applications(G, filename)
+
     # Graph modification UI
-    display_graph_controls(G)
+    display_graph_controls(G, app_cache)
 
     # Save Network Button
     if st.button("Save", type="primary", use_container_width=True):
-        save_network(G, file_path)
+        get_autosave().flush(filename)  # Pending background writes go first
+        save_network(G, filename)
         st.session_state["graph_saved"] = True
 
 if __name__ == "__main__":
@@ -1,88 +1,50 @@
 import streamlit as st
-import json
-import networkx as nx
 import numpy as np
-from pathlib import Path
-
-# Load the English NLP model
-import spacy
-nlp = spacy.load("en_core_web_sm")
-
-# Define the path for the file storage
-def get_file_path(filename: str) -> Path:
-    directory = Path(f"data/{filename}")
-    directory.mkdir(parents=True, exist_ok=True)  # Ensure the directory exists
-    return directory / f"Summary_{filename}.json"
-
-# Load data from the JSON file
-def load_network_data(file_path: Path):
-    if file_path.exists():
-        with open(file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data.get("Network", {}), data
-    return {}, {}
-
-# Create the network graph from the given network data
-def create_graph_from_network_data(network_data):
-    G = nx.DiGraph()
-    
-    # Add nodes with their colors as node attributes
-    for node in network_data.get('nodes', []):
-        G.add_node(node['id'], color=node['color'])
-    
-    # Add edges between nodes
-    for edge in network_data.get('edges', []):
-        G.add_edge(edge['source'], edge['target'], label=edge.get('label', ''))
-    
-    return G
-
-# Extract head nodes (nodes with no incoming edges)
-def find_head_nodes(G):
-    return [node for node in G.nodes if G.in_degree(node) == 0]
-
-# Find all branches starting from a specific node and filter out branches of length <= 1
-def find_all_branches(G, start_node):
-    branches = []
-    
-    def dfs(current_path):
-        current_node = current_path[-1]
-        # Explore all neighbors (children in a directed graph)
-        for neighbor in G.neighbors(current_node):
-            if neighbor not in current_path:  # Avoid cycles
-                dfs(current_path + [neighbor])
-        # If no neighbors, the branch is complete, only add it if length > 1
-        if len(current_path) > 1:
-            branches.append(current_path)
-    
-    dfs([start_node])
-    return branches
-
-# Generate a dictionary for the "Markers" field
-def generate_markers_dict(network_data, G):
-    head_nodes = find_head_nodes(G)
-    
-    # Find all branches, but only include those with more than 1 element in the branch
-    all_branches = {head_node: find_all_branches(G, head_node) for head_node in head_nodes}
-
-    # Generate "Combinations" (list of node IDs)
-    combinations = [node['id'] for node in network_data.get("nodes", [])]
-
-    # Format the branches for display, filtering out those with one or fewer elements
-    branches_info = {
-        head_node: [
-            f"10UG ({', '.join(branch)})" for branch in branches if len(branch) > 1  # Only keep branches with length > 1
-        ]
-        for head_node, branches in all_branches.items() if any(len(branch) > 1 for branch in branches)  # Only include head nodes with valid branches
-    }
-
-    # Construct the dictionary to return
-    markers_dict = {
-        "Combinations": combinations,
-        "Heads": head_nodes,
-        "Branches": branches_info
-    }
 
-    return markers_dict
+from utils.analytics import sync_application
+from utils.graph import graph_from_network
+from utils.graph_index import related_applications
+from utils.precompute import get_scheduler, markers_source, provisional_section, reachability_index
+from utils.reachability import MAX_LISTED_BRANCHES, generate_markers_dict
+from utils.session_cache import get_app_cache
+from utils.storage import update_sections
+
+def display_branch_limits(index):
+    """Limits for the listed branches; the number of branches is counted, not enumerated."""
+    col_length, col_count = st.columns(2)
+    with col_length:
+        max_nodes = st.number_input("Longest branch (features)", min_value=2, max_value=max(2, len(index.nodes)),
+                                    value=max(2, len(index.nodes)))
+    with col_count:
+        max_branches = st.number_input("Branches listed per head", min_value=1, value=MAX_LISTED_BRANCHES, step=50)
+
+    counts = [
+        f"**{head}**: {min(count, max_branches)} of {count} branches listed"
+        for head, count in index.branch_counts(max_nodes).items()
+        if count
+    ]
+    if counts:
+        st.markdown("  \n".join(counts))
+    return max_nodes, max_branches
+
+def display_co_occurring(index):
+    with st.expander("Features combined with ..."):
+        feature = st.selectbox("Feature", index.nodes, index=None, placeholder="Choose a feature")
+        if feature:
+            combined = index.co_occurring(feature)
+            st.write(", ".join(combined) if combined else "No other feature is on a branch with this one.")
+
+def markers_to_save(network_data, index, markers_dict, max_nodes, max_branches):
+    """Returns a function giving the section to save: all branches, unless the user
+    chooses to save only the listed ones, which are then saved with their limits."""
+    total = index.branch_counts()
+    listed = index.branch_counts(max_nodes)
+    if all(min(listed[head], max_branches) == count for head, count in total.items()):
+        return lambda: markers_dict                 # Nothing is left out
+    listed_only = st.checkbox(f"Save only the listed branches instead of all {sum(total.values())}")
+    if listed_only:
+        return lambda: {**markers_dict, "Limits": {"Longest branch": max_nodes, "Branches per head": max_branches}}
+    return lambda: generate_markers_dict(network_data, index)
 
 # Format the markers dictionary as text for the text area
 def format_markers_for_display(markers_dict):
@@ -102,9 +64,7 @@ def format_markers_for_display(markers_dict):
     return formatted_text.strip()  # Remove the last empty line after the last separator
 
 # Streamlit UI - Show concepts and save changes
-def display_and_save_concepts(filename: str, markers_dict: dict, existing_data: dict):
-    st.title(f"Concepts aid {filename}")
-    
+def display_and_save_concepts(filename: str, markers_dict: dict, to_save):
     # Format the markers dictionary for display in the text area
     formatted_text = format_markers_for_display(markers_dict)
     
@@ -113,13 +73,9 @@ def display_and_save_concepts(filename: str, markers_dict: dict, existing_data:
     
     # Save Button: Save the concepts text to JSON file, without overwriting existing data
     if st.button("Save", type="primary", use_container_width=True):
-        # Update the "Markers" field in the existing data with the new markers dictionary
-        existing_data["Markers"] = markers_dict  # Update the "Markers" field with the new dictionary
-        
-        # Save the updated data back to the file
-        file_path = get_file_path(filename)
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(existing_data, f, indent=4)
+        # Update only the "Markers" field, the rest of the file is kept as stored
+        update_sections(filename, {"Markers": to_save()})
+        sync_application(filename)
         
         st.success("Changes saved successfully!")
 
@@ -130,19 +86,38 @@ def main():
         st.stop()
 
     filename = st.session_state["filename"]
-    file_path = get_file_path(filename)
-    
-    # Load network data from file, including previous data
-    network_data, existing_data = load_network_data(file_path)
-    
+    app_cache = get_app_cache(filename)
+    st.title(f"Concepts aid {filename}")
+    # Results prepared after the last save are not used if that failed
+    if error := get_scheduler().error(filename):
+        st.warning(f"Preparing this page in the background failed: {error}")
+
+    # Load network data from file
+    network_data = app_cache.section("Network", {})
+
     if network_data:
-        G = create_graph_from_network_data(network_data)
-        markers_dict = generate_markers_dict(network_data, G)
+        G = graph_from_network(network_data)
+        index = reachability_index(filename, network_data)  # Usually built in the background after the claims were saved
+        max_nodes, max_branches = display_branch_limits(index)
+        markers_dict = provisional_section(filename, "Markers", markers_source(network_data, max_nodes, max_branches))
+        if markers_dict is None:
+            markers_dict = generate_markers_dict(network_data, index, max_nodes, max_branches)
+        to_save = markers_to_save(network_data, index, markers_dict, max_nodes, max_branches)
     else:
         markers_dict = {"Combinations": [], "Heads": [], "Branches": {}}
+        to_save = lambda: markers_dict
 
     # Display and allow saving concepts text
-    display_and_save_concepts(filename, markers_dict, existing_data)
+    display_and_save_concepts(filename, markers_dict, to_save)
+
+    if network_data:
+        display_co_occurring(index)
+
+        # Past applications with the same feature combinations
+        related = related_applications(G, exclude=filename)
+        if related:
+            st.subheader("Related applications")
+            st.markdown("\n".join(f"- **{name}**: {count} shared sub-structures ({score:.0%})" for name, count, score in related))
 
 # Run the main function
 if __name__ == "__main__":
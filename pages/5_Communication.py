@@ -1,71 +1,57 @@
 import streamlit as st
-import json
 from pathlib import Path
-import re
+
+from utils.citations import claim_number, draft_citations
+from utils.prior_art import ingest_document, list_documents, locate_features
+from utils.session_cache import get_app_cache
 
 # Ensure filename is in session state BEFORE using it
 if "filename" not in st.session_state:
     st.warning("No file selected. Please go to the main page.")
     st.stop()
 
-filename = st.session_state["filename"]          
+filename = st.session_state["filename"]
 directory = Path(f"data/{filename}")
 directory.mkdir(parents=True, exist_ok=True)  # Ensure directory exists
 file_path = directory / f"Summary_{filename}.json"
 
 st.title(f"Citations {filename}")
 
-# Load the JSON file and extract relevant data
-try:
-    with open(file_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-        
-        # Extract Cl_1 from User Entered Claims
-        comm_text = data.get("User Entered Claims", {}).get("Cl_1", "")
+# Load the claims and the edited feature table of this application
+app_cache = get_app_cache(filename)
+claims = app_cache.section("User Entered Claims", {})
+feature_table = app_cache.section("Edited Feature Table", {})
 
-        # Extract Cl_1 list from Feature Table
-        cl_1_list = data.get("Edited Feature Table", {}).get("Cl_1", [])
-except (FileNotFoundError, json.JSONDecodeError) as e:
-    st.error(f"Error loading file: {e}")
+if not claims:
+    st.error(f"No claims found in {file_path}. Please save claims in the tab 'Extract Features'.")
     st.stop()
 
-def cit_claim(comm_text):
-    """
-    Inserts the citation text immediately after the first appearance of each element 
-    in cl_1_list without adding extra punctuation. Also ensures proper formatting.
-    """
-    if not cl_1_list:
-        return comm_text  # If Cl_1 list is empty, return the original text
-
-    # Create a regex pattern for matching any Cl_1 element
-    pattern = r'\b(' + '|'.join(map(re.escape, cl_1_list)) + r')\b'
-
-    def replacement(match):
-        matched_text = match.group(0)
-        citation = " (D1: abstr., fig., page )"
-
-        # Get the character immediately following the match
-        match_end = match.end()
-        if match_end < len(comm_text) and comm_text[match_end] in ".,;:":
-            return f"{matched_text}{citation}"  # Don't duplicate punctuation
-        return f"{matched_text}{citation}"
-
-    # Replace only the first occurrence of each Cl_1 term
-    updated_text = re.sub(pattern, replacement, comm_text, count=0)
-
-    # Ensure text starts with a letter
-    updated_text = re.sub(r"^[^a-zA-Z]+", "", updated_text)
-
-    # Ensure a new line after each closing bracket ")"
-    updated_text = re.sub(r"\)([.,;:]?)", r")\1\n", updated_text)
-
-    # Ensure a new line if a punctuation sign is followed by a space and "a " or "an "
-    updated_text = re.sub(r"([.,;:]) (\b(?:a|an)\b )", r"\1\n\2", updated_text)
-
-    return updated_text
+# Local text of the cited documents, used to pre-fill the citation locations
+prior_art = list_documents(filename)
+with st.expander(f"Prior art ({', '.join(prior_art) if prior_art else 'none'})"):
+    with st.form("prior_art_form", clear_on_submit=True):
+        doc_id = st.selectbox("Document", [f"D{i+1}" for i in range(len(prior_art) + 1)])
+        doc_file = st.file_uploader("Plain text of the document (.txt)", type=["txt"])
+        add_doc_submit = st.form_submit_button("Add Document")
+    if add_doc_submit and doc_file:
+        ingest_document(filename, doc_id, doc_file.getvalue().decode("utf-8", errors="replace"))
+        st.rerun()
+
+col_docs, col_dependent = st.columns(2)
+with col_docs:
+    nr_documents = st.number_input("Number of cited documents", min_value=1, max_value=20, value=max(1, len(prior_art)))
+with col_dependent:
+    include_dependent = st.checkbox("Include dependent claims")
+
+documents = [f"D{i+1}" for i in range(nr_documents)]
+
+# Best matching passage per feature and document, retrieved in one batch
+all_features = [feature for features in feature_table.values() for feature in features]
+locations = locate_features(filename, all_features) if prior_art else {}
 
 # Apply citations automatically
-edited_text = cit_claim(comm_text)
+drafts = draft_citations(claims, feature_table, documents, include_dependent, locations)
 
-# Display the edited text in a single text_area (no button needed)
-st.text_area("Edited Claim 1 with Citations:", value=edited_text, height=400)
+# Display each edited claim in its own text_area (no button needed)
+for claim_key, edited_text in drafts.items():
+    st.text_area(f"Edited Claim {claim_number(claim_key)} with Citations:", value=edited_text, height=400)
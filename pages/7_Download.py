@@ -2,6 +2,11 @@ import streamlit as st
 import json
 from pathlib import Path
 
+from utils.autosave import get_autosave
+from utils.export import select_applications, zip_file
+from utils.revisions import diff_revisions, list_revisions, restore_revision, section_diff
+from utils.storage import load_summary
+
 # Ensure filename is in session state BEFORE using it
 if "filename" not in st.session_state:
     st.warning("No file selected. Please go to the main page.")
@@ -15,22 +20,72 @@ file_path = directory / f"Summary_{filename}.json"
 st.title(f"Download the summary  {filename}")
 
 # Load the JSON file
-try:
-    with open(file_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-        cl_1_list = data.get("Feature Table", {}).get("Cl_1", [])
-except (FileNotFoundError, json.JSONDecodeError) as e:
-    st.error(f"Error loading file: {e}")
+if not file_path.exists():
+    st.error(f"Error loading file: {file_path} not found")
     st.stop()
+data = load_summary(filename)
+cl_1_list = data.get("Feature Table", {}).get("Cl_1", [])
+
+# Show the download button; the file is rebuilt with the derived sections kept in the sidecars
+st.download_button(
+    label="📥 DOWNLOAD JSON FILE",
+    data=json.dumps(data, indent=4, ensure_ascii=False).encode("utf-8"),
+    file_name=f"Summary_{filename}.json",
+    mime="application/json"
+)
+
+# Earlier saves of this application, restorable without touching the other revisions
+st.markdown("<br>", unsafe_allow_html=True)
+st.subheader("Revision history")
 
-# Show the download button
-if file_path.exists():
-    with open(file_path, "rb") as f:
-        st.download_button(
-            label="📥 DOWNLOAD JSON FILE",
-            data=f,
-            file_name=f"Summary_{filename}.json",
-            mime="application/json"
-        )
+revisions = list_revisions(filename)
+if len(revisions) < 2:
+    st.write("No earlier revisions saved yet.")
 else:
-    st.warning("No file available for download.")
+    current = revisions[0]
+    revision = st.selectbox(
+        "Revision", revisions[1:],
+        format_func=lambda r: f"{r['id']}  ({r['time'].replace('T', ' ')})"
+    )
+    changes = diff_revisions(filename, revision["id"], current["id"])
+    if not changes:
+        st.write("Same content as the current summary.")
+    for key, status in changes.items():
+        with st.expander(f"{key}: {status} since this revision"):
+            st.code(section_diff(filename, revision["id"], current["id"], key), language="diff")
+
+    if st.button(f"Restore revision {revision['id']}"):
+        get_autosave().flush(filename)  # Pending background writes go first
+        restore_revision(filename, revision["id"])
+        st.success(f"Revision {revision['id']} restored; the replaced summary stays in the history.")
+
+# Bulk export of several applications as one ZIP archive
+st.markdown("<br>", unsafe_allow_html=True)
+st.subheader("Bulk export")
+
+col_pattern, col_classes = st.columns(2)
+with col_pattern:
+    name_pattern = st.text_input("Application name pattern", value="*", help="Wildcards: * and ?")
+with col_classes:
+    classes_filter = st.text_input("Classes contain", value="")
+
+use_dates = st.checkbox("Filter by date")
+date_from = date_to = None
+if use_dates:
+    col_from, col_to = st.columns(2)
+    with col_from:
+        date_from = st.date_input("From", format="DD-MM-YYYY")
+    with col_to:
+        date_to = st.date_input("To", format="DD-MM-YYYY")
+
+selected = select_applications(name_pattern, date_from, date_to, classes_filter)
+st.write(f"{len(selected)} applications selected: {', '.join(selected)}")
+
+if selected:
+    # The archive is written to a temporary file only when the button is clicked
+    st.download_button(
+        label="📥 DOWNLOAD ZIP",
+        data=lambda: zip_file(selected),
+        file_name="applications.zip",
+        mime="application/zip"
+    )
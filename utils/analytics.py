@@ -0,0 +1,239 @@
+"""Columnar (Parquet) dataset of the feature tables of all applications.
+
+One row per feature occurrence, partitioned by application under
+data/_analytics/features/application=<NAME>/, so a changed summary only
+rewrites its own partition. Queries read the dataset memory-mapped.
+
+    python -m utils.analytics sync
+    python -m utils.analytics top [--limit 10]
+    python -m utils.analytics together "wheel adapter element"
+"""
+import argparse
+import json
+import os
+import re
+import sys
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from utils.export import parse_date
+from utils.storage import DATA_DIR, iter_applications, read_summary, summary_path
+from utils.vocabulary import normalize
+
+DATASET_DIR = DATA_DIR / "_analytics" / "features"
+MANIFEST_PATH = DATASET_DIR.parent / "manifest.json"
+
+ROLES = ("a_list", "prep_list", "the_list")
+
+SCHEMA = pa.schema([
+    ("section", pa.string()),
+    ("claim", pa.int32()),
+    ("position", pa.int32()),
+    ("role", pa.string()),
+    ("feature", pa.string()),
+    ("canonical", pa.string()),
+    ("date", pa.date32()),
+    ("classes", pa.list_(pa.string())),
+])
+
+
+def split_classes(classes: str) -> list[str]:
+    """'g01l1/03, g01l3/25' -> ['G01L1/03', 'G01L3/25']"""
+    return [c.strip().upper() for c in re.split(r"[,;\n]", str(classes or "")) if c.strip()]
+
+
+def _claim_number(value) -> int | None:
+    try:
+        return int(str(value).split("_")[-1])
+    except ValueError:
+        return None
+
+
+def feature_rows(data: dict) -> dict:
+    """Column lists with one entry per feature occurrence of one summary."""
+    columns = {name: [] for name in SCHEMA.names}
+    saved_date = parse_date(data.get("Date", ""))
+    classes = split_classes(data.get("Classes", ""))
+
+    def add(section, claim, position, role, feature):
+        if not isinstance(feature, str) or not feature.strip():
+            return
+        for name, value in zip(SCHEMA.names, (section, claim, position, role, feature.strip(),
+                                               normalize(feature), saved_date, classes)):
+            columns[name].append(value)
+
+    concatenated = data.get("Concatenated DataFrame", {})
+    claims = concatenated.get("Cl_nr", [])
+    for role in ROLES:
+        for position, feature in enumerate(concatenated.get(role, [])):
+            claim = _claim_number(claims[position]) if position < len(claims) else None
+            add("Concatenated DataFrame", claim, position, role, feature)
+
+    for claim_key, features in data.get("Edited Feature Table", {}).items():
+        for position, feature in enumerate(features):
+            add("Edited Feature Table", _claim_number(claim_key), position, "feature", feature)
+
+    markers = data.get("Markers", {})
+    for role in ("Combinations", "Heads"):
+        for position, feature in enumerate(markers.get(role, [])):
+            add("Markers", None, position, role, feature)
+
+    return columns
+
+
+def _partition_dir(filename: str):
+    return DATASET_DIR / f"application={filename}"
+
+
+def _load_manifest() -> dict:
+    try:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _save_manifest(manifest: dict) -> None:
+    MANIFEST_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with open(MANIFEST_PATH, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+
+def _stamp(filename: str) -> list[int] | None:
+    try:
+        stat = summary_path(filename).stat()
+    except FileNotFoundError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _write_partition(filename: str) -> None:
+    table = pa.table(feature_rows(read_summary(filename)), schema=SCHEMA)
+    partition = _partition_dir(filename)
+    partition.mkdir(parents=True, exist_ok=True)
+    target = partition / "part-0.parquet"
+    tmp = partition / "part-0.parquet.tmp"
+    pq.write_table(table, tmp, compression="zstd")
+    os.replace(tmp, target)                         # Readers never see a half written partition
+
+
+def _drop_partition(filename: str) -> None:
+    partition = _partition_dir(filename)
+    if partition.is_dir():
+        for path in partition.iterdir():
+            path.unlink()
+        partition.rmdir()
+
+
+def sync_application(filename: str) -> None:
+    """Rewrites the partition of one application, e.g. right after it was saved."""
+    manifest = _load_manifest()
+    _write_partition(filename)
+    manifest[filename] = _stamp(filename)
+    _save_manifest(manifest)
+
+
+def sync_dataset() -> int:
+    """Brings the dataset up to date with all summaries; returns the number of changed applications."""
+    manifest = _load_manifest()
+    names = set(iter_applications())
+    changed = 0
+
+    for filename in list(manifest):
+        if filename not in names:
+            _drop_partition(filename)
+            del manifest[filename]
+            changed += 1
+
+    for filename in sorted(names):
+        stamp = _stamp(filename)
+        if manifest.get(filename) == stamp and _partition_dir(filename).is_dir():
+            continue
+        _write_partition(filename)
+        manifest[filename] = stamp
+        changed += 1
+
+    _save_manifest(manifest)
+    return changed
+
+
+def read_features(columns: list[str] | None = None, filters=None) -> pa.Table:
+    """Reads the dataset memory-mapped; 'application' comes from the partition path."""
+    if not DATASET_DIR.is_dir():
+        sync_dataset()
+    return pq.read_table(DATASET_DIR, columns=columns, filters=filters, memory_map=True, partitioning="hive")
+
+
+def top_features_per_class(limit: int = 10, section: str = "Concatenated DataFrame", role: str = "a_list") -> pa.Table:
+    """Most frequent canonical features for each classification."""
+    table = read_features(["canonical", "classes"], filters=[("section", "=", section), ("role", "=", role)])
+    if table.num_rows == 0:
+        return pa.table({"class": [], "canonical": [], "count": []})
+
+    # One row per (class, feature) pair
+    classes = table["classes"].combine_chunks()
+    exploded = pa.table({
+        "class": pc.list_flatten(classes),
+        "canonical": pc.take(table["canonical"], pc.list_parent_indices(classes)),
+    })
+    counts = exploded.group_by(["class", "canonical"]).aggregate([("canonical", "count")])
+    counts = counts.rename_columns(["class", "canonical", "count"]).sort_by([("class", "ascending"), ("count", "descending")])
+
+    # Keep the first `limit` rows of every class
+    keep = []
+    current, seen = None, 0
+    for i, cls in enumerate(counts["class"].to_pylist()):
+        seen = seen + 1 if cls == current else 1
+        current = cls
+        if seen <= limit:
+            keep.append(i)
+    return counts.take(keep)
+
+
+def features_seen_together(feature: str, limit: int = 20) -> pa.Table:
+    """Features that occur in the same claims as feature, most frequent first."""
+    canonical = normalize(feature)
+    table = read_features(
+        ["application", "claim", "canonical"],
+        filters=[("section", "=", "Concatenated DataFrame"), ("role", "in", ["a_list", "the_list"])],
+    )
+    if table.num_rows == 0:
+        return pa.table({"canonical": [], "count": []})
+
+    keys = pc.binary_join_element_wise(
+        pc.cast(table["application"], pa.string()), pc.cast(pc.fill_null(table["claim"], 0), pa.string()), "/"
+    )
+    claims_with_feature = pc.unique(pc.filter(keys, pc.equal(table["canonical"], canonical)))
+    together = table.filter(pc.and_(pc.is_in(keys, claims_with_feature), pc.not_equal(table["canonical"], canonical)))
+
+    counts = together.group_by("canonical").aggregate([("canonical", "count")])
+    counts = counts.rename_columns(["canonical", "count"]).sort_by([("count", "descending"), ("canonical", "ascending")])
+    return counts.slice(0, limit)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Feature analytics over all applications.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("sync", help="Update the Parquet dataset from the summaries")
+    top = commands.add_parser("top", help="Most frequent features per classification")
+    top.add_argument("--limit", type=int, default=10)
+    together = commands.add_parser("together", help="Features seen together with a feature")
+    together.add_argument("feature")
+    together.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if args.command == "sync":
+        print(f"Updated {sync_dataset()} applications in {DATASET_DIR}")
+    elif args.command == "top":
+        sync_dataset()
+        print(top_features_per_class(args.limit).to_pandas().to_string(index=False))
+    else:
+        sync_dataset()
+        print(features_seen_together(args.feature, args.limit).to_pandas().to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
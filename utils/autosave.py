@@ -0,0 +1,113 @@
+"""Write-behind autosave of summary sections.
+
+Pages report section-level changes with submit(). Changes to one application are
+coalesced until it has been quiet for COALESCE_WINDOW seconds (at most MAX_DELAY
+after the first change) and then written once, atomically, by a background
+thread, so the script thread never waits for the disk. Writes of one application
+are serialized: flush() waits for a background write in progress, so an older
+batch can never land after the Save that follows it. Autosaves are not kept in
+the revision history; the explicit Save that follows them is.
+"""
+import atexit
+import threading
+import time
+
+from utils.storage import update_sections
+
+COALESCE_WINDOW = 1.0
+MAX_DELAY = 5.0
+
+
+def _after_flush(filename: str, sections: dict) -> None:
+    """Keeps the indexes fed by the explicit Save buttons up to date."""
+    from utils.analytics import sync_application
+    from utils.graph import graph_from_network
+    from utils.graph_index import update_application
+    from utils.suggestions import update_suggestions
+
+    if "Network" in sections:
+        update_application(filename, graph_from_network(sections["Network"]))
+    if sections.keys() & {"Edited Feature Table", "Classes", "Keywords"}:
+        update_suggestions(filename)
+    sync_application(filename)
+
+
+class AutosaveService:
+    def __init__(self):
+        self._pending = {}                          # filename -> {section: value}
+        self._deadlines = {}                        # filename -> (flush at, latest flush at)
+        self._condition = threading.Condition()
+        self._write_locks = {}                      # filename -> lock held from taking a batch to writing it
+        self.errors = {}                            # filename -> last flush error
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, filename: str, sections: dict) -> None:
+        now = time.monotonic()
+        with self._condition:
+            self._pending.setdefault(filename, {}).update(sections)
+            _, latest = self._deadlines.get(filename, (None, now + MAX_DELAY))
+            self._deadlines[filename] = (min(now + COALESCE_WINDOW, latest), latest)
+            self._condition.notify()
+
+    def has_pending(self, filename: str) -> bool:
+        with self._condition:
+            return filename in self._pending
+
+    def flush(self, filename: str | None = None) -> None:
+        """Writes pending changes now (all applications if filename is None).
+
+        Returns once every earlier write of these applications is on disk."""
+        with self._condition:
+            names = list(self._pending) if filename is None else [filename]
+        for name in names:
+            self._take_and_write(name)
+
+    def _write_lock(self, filename: str) -> threading.Lock:
+        with self._condition:
+            return self._write_locks.setdefault(filename, threading.Lock())
+
+    def _take(self, filename: str) -> dict:
+        self._deadlines.pop(filename, None)
+        return self._pending.pop(filename, {})
+
+    def _take_and_write(self, filename: str) -> None:
+        with self._write_lock(filename):            # Waits for a write of filename in progress
+            with self._condition:
+                sections = self._take(filename)
+            if sections:
+                self._write(filename, sections)
+
+    def _write(self, filename: str, sections: dict) -> None:
+        try:
+            update_sections(filename, sections, revision=False)  # The next Save records the revision
+            _after_flush(filename, sections)
+            self.errors.pop(filename, None)
+        except Exception as e:  # Never let the background thread die
+            self.errors[filename] = e
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._deadlines:
+                    self._condition.wait()
+                now = time.monotonic()
+                due = [name for name, (flush_at, _) in self._deadlines.items() if flush_at <= now]
+                if not due:
+                    self._condition.wait(min(flush_at for flush_at, _ in self._deadlines.values()) - now)
+                    continue
+            for name in due:
+                self._take_and_write(name)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_autosave() -> AutosaveService:
+    """The process-wide autosave service shared by all sessions."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = AutosaveService()
+            atexit.register(_service.flush)
+        return _service
@@ -0,0 +1,119 @@
+"""Catalog of all applications for the start page.
+
+A compact index of the metadata of every data/<NAME>/Summary_<NAME>.json is
+kept in data/_index/catalog.json. Refreshing it only stats the summaries;
+a summary is opened again only when its mtime or size changed.
+"""
+import json
+import os
+import re
+import threading
+
+from utils.storage import DATA_DIR, load_summary, summary_path, write_summary
+
+CATALOG_PATH = DATA_DIR / "_index" / "catalog.json"
+CATALOG_VERSION = 1
+
+# Sections written by the pages after the General one, in pipeline order
+PIPELINE_SECTIONS = ["User Entered Claims", "Edited Feature Table", "Concatenated DataFrame", "Network", "Markers"]
+
+NAME_PATTERN = re.compile(r"^[A-Z0-9][A-Z0-9._-]*$")
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def _text(value) -> str:
+    return value.strip() if isinstance(value, str) else ""
+
+
+def catalog_entry(filename: str, stamp: list[int]) -> dict:
+    data = load_summary(filename)
+    return {
+        "stamp": stamp,
+        "date": _text(data.get("Date")),
+        "claims": _text(data.get("Nr. Claims")),
+        "classes": _text(data.get("Classes")),
+        "keywords": _text(data.get("Keywords")),
+        "sections": [section for section in PIPELINE_SECTIONS if data.get(section)],
+    }
+
+
+def _scan() -> dict:
+    """Name -> [mtime_ns, size] of every summary, without opening any file."""
+    stamps = {}
+    try:
+        directories = os.scandir(DATA_DIR)
+    except FileNotFoundError:
+        return stamps
+    with directories:
+        for directory in directories:
+            if not directory.is_dir() or directory.name.startswith(("_", ".")):
+                continue
+            try:
+                stat = os.stat(os.path.join(directory.path, f"Summary_{directory.name}.json"))
+            except FileNotFoundError:
+                continue
+            stamps[directory.name] = [stat.st_mtime_ns, stat.st_size]
+    return stamps
+
+
+def _load() -> dict:
+    try:
+        with open(CATALOG_PATH, "r", encoding="utf-8") as f:
+            stored = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    return stored.get("applications", {}) if stored.get("version") == CATALOG_VERSION else {}
+
+
+def _save(applications: dict) -> None:
+    CATALOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = CATALOG_PATH.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": CATALOG_VERSION, "applications": applications}, f, ensure_ascii=False)
+    os.replace(tmp_path, CATALOG_PATH)
+
+
+def refresh_catalog() -> dict:
+    """Brings the catalog up to date with the data directory and returns it (name -> entry)."""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = _load()
+        stamps = _scan()
+        # Sessions may still iterate the current catalog, so changes go to a new dict
+        catalog = {
+            name: _catalog[name] if name in _catalog and _catalog[name]["stamp"] == stamp else catalog_entry(name, stamp)
+            for name, stamp in sorted(stamps.items())
+        }
+        if catalog != _catalog:
+            _catalog = catalog
+            _save(_catalog)
+        return _catalog
+
+
+def search_catalog(catalog: dict, query: str = "") -> list[str]:
+    """Names matching all words of query in name, classes or keywords; name prefixes first."""
+    words = query.lower().split()
+    if not words:
+        return list(catalog)
+
+    def matches(name, entry):
+        text = " ".join((name, entry["classes"], entry["keywords"])).lower()
+        return all(word in text for word in words)
+
+    found = [name for name, entry in catalog.items() if matches(name, entry)]
+    return sorted(found, key=lambda name: not name.lower().startswith(words[0]))
+
+
+def is_valid_name(filename: str) -> bool:
+    return bool(NAME_PATTERN.match(filename))
+
+
+def create_application(filename: str) -> bool:
+    """Creates an empty summary for a new application; False if it already exists."""
+    if summary_path(filename).exists():
+        return False
+    write_summary(filename, {})
+    return True
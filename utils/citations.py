@@ -0,0 +1,95 @@
+import re
+from functools import lru_cache
+
+# Dependent claims refer back, e.g. "The apparatus of claim 1" or "according to claims 1-3"
+CLAIM_REFERENCE = re.compile(r"\bclaims?\s+\d+", re.IGNORECASE)
+
+DEFAULT_LOCATION = "abstr., fig., page "
+
+
+def is_independent(claim_text: str) -> bool:
+    return CLAIM_REFERENCE.search(claim_text) is None
+
+
+def claim_number(claim_key: str) -> int:
+    """'Cl_12' -> 12"""
+    try:
+        return int(claim_key.split("_")[-1])
+    except ValueError:
+        return 0
+
+
+def freeze_table(feature_table: dict) -> tuple:
+    """Hashable form of a feature table (claim -> features), without empty cells."""
+    return tuple(
+        (claim, tuple(feature for feature in features if feature and feature.strip()))
+        for claim, features in feature_table.items()
+    )
+
+
+@lru_cache(maxsize=32)
+def compile_matchers(frozen_table: tuple) -> dict:
+    """Compiles one alternation regex per claim, cached by the feature table's hash.
+
+    Longer features come first so that 'a wheel adapter element' wins over 'a wheel'."""
+    matchers = {}
+    for claim, features in frozen_table:
+        if not features:
+            matchers[claim] = None
+            continue
+        alternatives = sorted(set(features), key=len, reverse=True)
+        matchers[claim] = re.compile(r"\b(" + "|".join(map(re.escape, alternatives)) + r")\b")
+    return matchers
+
+
+def citation(feature: str, documents: list[str], locations: dict | None = None) -> str:
+    """Citation slots for one feature: ' (D1: abstr., fig., page ; D2: ...)'."""
+    locations = locations or {}
+    slots = [f"{doc}: {locations.get((doc, feature), DEFAULT_LOCATION)}" for doc in documents]
+    return f" ({'; '.join(slots)})"
+
+
+def cit_claim(comm_text: str, matcher: re.Pattern | None, documents: list[str],
+              locations: dict | None = None) -> str:
+    """
+    Inserts the citation text immediately after the first appearance of each feature
+    matched by matcher without adding extra punctuation. Also ensures proper formatting.
+    """
+    if matcher is None:
+        return comm_text  # If the claim has no features, return the original text
+
+    cited = set()
+
+    def replacement(match):
+        matched_text = match.group(0)
+        if matched_text in cited:
+            return matched_text
+        cited.add(matched_text)
+        return f"{matched_text}{citation(matched_text, documents, locations)}"
+
+    # Cite only the first occurrence of each feature
+    updated_text = matcher.sub(replacement, comm_text)
+
+    # Ensure text starts with a letter
+    updated_text = re.sub(r"^[^a-zA-Z]+", "", updated_text)
+
+    # Ensure a new line after each closing bracket ")"
+    updated_text = re.sub(r"\)([.,;:]?)", r")\1\n", updated_text)
+
+    # Ensure a new line if a punctuation sign is followed by a space and "a " or "an "
+    updated_text = re.sub(r"([.,;:]) (\b(?:a|an)\b )", r"\1\n\2", updated_text)
+
+    return updated_text
+
+
+def draft_citations(claims: dict, feature_table: dict, documents: list[str],
+                    include_dependent: bool = False, locations: dict | None = None) -> dict:
+    """Drafts the cited text of all independent claims (optionally all claims) in one pass."""
+    matchers = compile_matchers(freeze_table(feature_table))
+    drafts = {}
+    for claim_key in sorted(claims, key=claim_number):
+        claim_text = claims[claim_key]
+        if not include_dependent and not is_independent(claim_text):
+            continue
+        drafts[claim_key] = cit_claim(claim_text, matchers.get(claim_key), documents, locations)
+    return drafts
@@ -0,0 +1,44 @@
+import re
+from io import BytesIO
+from typing import Iterable, Iterator
+
+from docx import Document
+
+CLAIM_FILE_TYPES = ["txt", "docx"]
+
+
+def remove_parenthesized_text(claim: str) -> str:
+    cleaned = re.sub(r'\([^)]*\)', '', claim)
+    cleaned = re.sub(r'\s+', ' ', cleaned).strip()
+    return cleaned
+
+
+def iter_claim_lines(lines: Iterable[str]) -> Iterator[str]:
+    """Non-empty lines, stripped; every line is one claim."""
+    for line in lines:
+        for part in line.splitlines():
+            if part.strip():
+                yield part.strip()
+
+
+def split_claim_lines(claims_text: str) -> list[str]:
+    """One claim per non-empty line, reference signs in brackets removed."""
+    return [remove_parenthesized_text(claim) for claim in iter_claim_lines(claims_text.split("\n"))]
+
+
+def _decode(data: bytes) -> str:
+    for encoding in ("utf-8-sig", "cp1252"):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode("latin-1")
+
+
+def iter_claim_file(name: str, data: bytes) -> Iterator[str]:
+    """Claims of an uploaded .txt (one per line) or .docx file (one per paragraph), as written."""
+    if name.lower().endswith(".docx"):
+        lines = (paragraph.text for paragraph in Document(BytesIO(data)).paragraphs)
+    else:
+        lines = iter(_decode(data).splitlines())
+    yield from iter_claim_lines(lines)
@@ -0,0 +1,85 @@
+"""Accuracy and speed of an extraction engine against a reference engine.
+
+    python -m utils.engine_accuracy [--engine rules] [--reference spacy]
+
+Corpora: test_set.txt, claims_test.txt, New Text Document (2).txt (reference
+engine output) and the stored "Feature Table" of every data/* summary, which
+holds the spaCy output of the time the claims were saved.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from utils.claims import split_claim_lines
+from utils.nlp import dedupe_chunks, get_engine
+from utils.storage import iter_applications, read_summary
+
+TEXT_CORPORA = ["test_set.txt", "claims_test.txt", "New Text Document (2).txt"]
+
+
+def timed_chunks(engine_name: str, claims: list[str]) -> tuple[list[list[str]], float]:
+    engine = get_engine(engine_name)
+    start = time.perf_counter()
+    chunks = [dedupe_chunks(c) for c in engine.chunks(claims)]
+    return chunks, time.perf_counter() - start
+
+
+def score(predicted: list[list[str]], expected: list[list[str]]) -> dict:
+    """Micro-averaged precision/recall/F1 over exact (case-insensitive) phrases per claim."""
+    true_positives = predicted_total = expected_total = 0
+    for pred, exp in zip(predicted, expected):
+        pred_set = {p.lower() for p in pred}
+        exp_set = {e.lower() for e in exp if e}
+        true_positives += len(pred_set & exp_set)
+        predicted_total += len(pred_set)
+        expected_total += len(exp_set)
+    precision = true_positives / predicted_total if predicted_total else 0.0
+    recall = true_positives / expected_total if expected_total else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"precision": precision, "recall": recall, "f1": f1, "claims": len(expected)}
+
+
+def corpora(reference: str) -> list[tuple[str, list[str], list[list[str]] | None]]:
+    """(name, claims, stored reference output or None to run the reference engine)"""
+    result = []
+    for name in TEXT_CORPORA:
+        path = Path(name)
+        if path.is_file():
+            result.append((name, split_claim_lines(path.read_text(encoding="utf-8")), None))
+
+    for filename in iter_applications():
+        data = read_summary(filename)
+        claims = data.get("User Entered Claims", {})
+        stored = data.get("Feature Table", {})
+        if claims and stored and reference == "spacy":
+            keys = [key for key in claims if key in stored]
+            result.append((f"data/{filename}", [claims[k] for k in keys], [dedupe_chunks(stored[k]) for k in keys]))
+    return result
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare an extraction engine to a reference engine.")
+    parser.add_argument("--engine", default="rules")
+    parser.add_argument("--reference", default="spacy")
+    args = parser.parse_args(argv)
+
+    print(f"{'corpus':<32}{'claims':>7}{'P':>7}{'R':>7}{'F1':>7}{'speedup':>9}")
+    for name, claims, expected in corpora(args.reference):
+        predicted, engine_time = timed_chunks(args.engine, claims)
+        reference_time = None
+        if expected is None:
+            try:
+                expected, reference_time = timed_chunks(args.reference, claims)
+            except OSError as e:                    # Model package not installed
+                print(f"{name:<32}skipped: {e}")
+                continue
+        result = score(predicted, expected)
+        speedup = f"{reference_time / engine_time:.0f}x" if reference_time and engine_time else "-"
+        print(f"{name:<32}{result['claims']:>7}{result['precision']:>7.2f}{result['recall']:>7.2f}"
+              f"{result['f1']:>7.2f}{speedup:>9}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""Bulk export of applications as a single streamed ZIP archive.
+
+Usage from the repository root:
+
+    python -m utils.export --pattern "A*" --date-from 01-01-2025 --date-to 31-03-2025 -o Q1.zip
+"""
+import argparse
+import fnmatch
+import io
+import sys
+import tempfile
+import zipfile
+from datetime import date, datetime
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator
+
+from utils.catalog import refresh_catalog
+from utils.sidecar import SECTIONS
+from utils.storage import app_directory, sidecar_path
+
+DATE_FORMAT = "%d-%m-%Y"                    # Format of the "Date" field written by the General page
+CHUNK_SIZE = 64 * 1024
+
+# Already compressed formats are stored as they are
+STORED_SUFFIXES = {".docx", ".png", ".jpg", ".jpeg", ".arrow"}
+
+
+def parse_date(value: str) -> date | None:
+    try:
+        return datetime.strptime(value.strip(), DATE_FORMAT).date()
+    except (AttributeError, ValueError):
+        return None
+
+
+def date_argument(value: str) -> date:
+    parsed = parse_date(value)
+    if parsed is None:
+        raise argparse.ArgumentTypeError(f"invalid date '{value}', expected DD-MM-YYYY")
+    return parsed
+
+
+def matches(name: str, data: dict, pattern: str = "*", date_from: date | None = None,
+            date_to: date | None = None, classes: str = "") -> bool:
+    """Checks one application against the name pattern, date range and "Classes" filter."""
+    if not fnmatch.fnmatchcase(name, pattern.upper() or "*"):
+        return False
+
+    if date_from or date_to:
+        saved = parse_date(data.get("Date", ""))
+        if saved is None:
+            return False
+        if date_from and saved < date_from:
+            return False
+        if date_to and saved > date_to:
+            return False
+
+    if classes and classes.lower() not in str(data.get("Classes", "")).lower():
+        return False
+
+    return True
+
+
+def select_applications(pattern: str = "*", date_from: date | None = None,
+                        date_to: date | None = None, classes: str = "") -> list[str]:
+    """Names of the matching applications, from the catalog: only changed summaries are opened."""
+    return [
+        name for name, entry in refresh_catalog().items()
+        if matches(name, {"Date": entry["date"], "Classes": entry["classes"]}, pattern, date_from, date_to, classes)
+    ]
+
+
+def application_files(filename: str) -> list[Path]:
+    """Summary JSON with its derived sidecars, Word summary and application image of one application."""
+    directory = app_directory(filename)
+    candidates = [
+        directory / f"Summary_{filename}.json",
+        *(sidecar_path(filename, key) for key in SECTIONS),
+        directory / f"Summary_{filename}.docx",
+        directory / f"appl_image_{filename}.png",
+    ]
+    return [path for path in candidates if path.is_file()]
+
+
+class _ChunkWriter(io.RawIOBase):
+    """Unseekable sink that hands out whatever zipfile has written so far."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> Iterator[bytes]:
+        chunks, self._chunks = self._chunks, []
+        yield from chunks
+
+
+def stream_zip(filenames: Iterable[str]) -> Iterator[bytes]:
+    """Yields a ZIP archive of the given applications chunk by chunk.
+
+    Files are read in small blocks and the archive is never held in memory or on
+    disk as a whole; zipfile writes data descriptors since the sink can't seek."""
+    sink = _ChunkWriter()
+    with zipfile.ZipFile(sink, mode="w") as archive:
+        for filename in filenames:
+            for path in application_files(filename):
+                arcname = path.relative_to(app_directory(filename)).as_posix()
+                info = zipfile.ZipInfo.from_file(path, arcname=f"{filename}/{arcname}")
+                info.compress_type = (
+                    zipfile.ZIP_STORED if path.suffix.lower() in STORED_SUFFIXES else zipfile.ZIP_DEFLATED
+                )
+                with open(path, "rb") as src, archive.open(info, mode="w") as dst:
+                    while block := src.read(CHUNK_SIZE):
+                        dst.write(block)
+                        yield from sink.drain()
+                yield from sink.drain()
+    # Central directory is written on close
+    yield from sink.drain()
+
+
+def write_zip(filenames: Iterable[str], out: BinaryIO) -> int:
+    size = 0
+    for chunk in stream_zip(filenames):
+        out.write(chunk)
+        size += len(chunk)
+    return size
+
+
+def zip_file(filenames: Iterable[str]) -> BinaryIO:
+    """ZIP archive of the applications in a temporary file (deleted when closed), read from its start."""
+    archive = tempfile.TemporaryFile(suffix=".zip")
+    write_zip(filenames, archive)
+    archive.seek(0)
+    return archive
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Export applications as a single ZIP archive.")
+    parser.add_argument("--pattern", default="*", help="Application name pattern, e.g. 'EP23*'")
+    parser.add_argument("--date-from", type=date_argument, help="First date (DD-MM-YYYY)")
+    parser.add_argument("--date-to", type=date_argument, help="Last date (DD-MM-YYYY)")
+    parser.add_argument("--classes", default="", help="Text the 'Classes' field must contain")
+    parser.add_argument("-o", "--output", help="ZIP file to write (default: stdout)")
+    parser.add_argument("--list", action="store_true", help="Only list the selected applications")
+    args = parser.parse_args(argv)
+
+    selected = select_applications(args.pattern, args.date_from, args.date_to, args.classes)
+    if not selected:
+        print("No applications match.", file=sys.stderr)
+        return 1
+    if args.list:
+        print("\n".join(selected))
+        return 0
+
+    if args.output:
+        with open(args.output, "wb") as out:
+            size = write_zip(selected, out)
+    else:
+        size = write_zip(selected, sys.stdout.buffer)
+    print(f"Exported {len(selected)} applications ({size} bytes)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
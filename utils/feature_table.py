@@ -0,0 +1,57 @@
+"""Long-format feature table: one row per (claim, position, feature).
+
+The "Feature Table" and "Edited Feature Table" sections are stored as
+{"Cl_1": [feature, ...], ...}. The editor works on rows of the claims being
+shown instead of a claims × longest-claim grid, and edits are applied back
+claim by claim: only the claims whose rows changed are replaced.
+"""
+import pandas as pd
+
+COLUMNS = ["Claim", "Position", "Feature"]
+PAGE_SIZE = 10                                      # Claims per editor page
+
+
+def claim_keys(num_claims: int) -> list[str]:
+    return [f"Cl_{i+1}" for i in range(num_claims)]
+
+
+def feature_rows(features: dict, keys: list[str]) -> pd.DataFrame:
+    """Rows of the claims in keys, in claim and feature order."""
+    rows = [
+        (key, position, feature)
+        for key in keys
+        for position, feature in enumerate(features.get(key, []), start=1)
+    ]
+    return pd.DataFrame(rows, columns=COLUMNS).astype({"Claim": "object", "Position": "Int64", "Feature": "object"})
+
+
+def features_from_rows(rows: pd.DataFrame, keys: list[str]) -> dict:
+    """{"Cl_1": [...], ...} of the claims in keys. Features are ordered by position,
+    rows without a position go last; empty features are dropped."""
+    features = {key: [] for key in keys}
+    if rows.empty:
+        return features
+    ordered = rows.assign(_row=range(len(rows))).sort_values(["Position", "_row"], na_position="last", kind="stable")
+    for key, feature in zip(ordered["Claim"], ordered["Feature"]):
+        if key in features and isinstance(feature, str) and feature.strip():
+            features[key].append(feature.strip())
+    return features
+
+
+def apply_feature_edits(features: dict, keys: list[str], rows: pd.DataFrame) -> tuple[dict, list[str]]:
+    """Applies the edited rows of the claims in keys to features.
+
+    Returns the updated features (a new dict if anything changed) and the changed claims."""
+    edited = features_from_rows(rows, keys)
+    changed = [key for key in keys if edited[key] != features.get(key, [])]
+    if not changed:
+        return features, []
+    return {**features, **{key: edited[key] for key in changed}}, changed
+
+
+def page_count(num_claims: int, page_size: int = PAGE_SIZE) -> int:
+    return max(1, -(-num_claims // page_size))
+
+
+def page_keys(keys: list[str], page: int, page_size: int = PAGE_SIZE) -> list[str]:
+    return keys[page * page_size:(page + 1) * page_size]
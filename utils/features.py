@@ -0,0 +1,173 @@
+"""Segmentation of claims into the rows of the "Concatenated DataFrame".
+
+Every claim is split at its features into a_list (introduced features),
+the_list (back references) and prep_list (the text in between). After an
+amendment only the claims whose text or features changed are segmented again;
+the rows of unchanged claims are reused, even if their number changed.
+"""
+import re
+
+import pandas as pd
+
+from utils.vocabulary import DEFAULT_LANGUAGE, DETERMINERS, detect_language
+
+COLUMNS = ("a_list", "prep_list", "the_list")
+
+
+def _openings(words) -> tuple[str, ...]:
+    return tuple(f"{word} " for word in words) + tuple(f"{word.capitalize()} " for word in words)
+
+
+# How claim parts that are introduced features and back references begin, per claim language
+INTRODUCING = {
+    "en": ('A ', 'a ', 'An ', 'an '),
+    "de": _openings(DETERMINERS["de"][0]),
+    "fr": _openings(DETERMINERS["fr"][0]),
+}
+REFERRING = {
+    "en": ('The ', 'the ', 'said '),
+    "de": _openings(DETERMINERS["de"][1]),
+    "fr": _openings(word for word in DETERMINERS["fr"][1] if word != "l'") + ("l'", "L'", "l’", "L’"),
+}
+
+
+def _without(item: str, openings: tuple[str, ...]) -> str:
+    return next(item[len(opening):] for opening in openings if item.startswith(opening))
+
+
+def split_claims(claim_text, featuretable):
+    """Splits claim text based on its features"""
+    claim_text = re.sub(r'\s+', ' ', claim_text.strip())
+
+    # If no features are provided, return the entire claim_text as a single element
+    if not featuretable:
+        return [claim_text]
+
+    # Create a regex pattern to match any compound noun phrase
+    compound_pattern = '|'.join(map(re.escape, featuretable))
+
+    # Split claim text using the compound noun phrases
+    segments = re.split(f"({compound_pattern})", claim_text)
+
+    # Filter out empty or whitespace-only segments
+    claim_parts = [segment.strip() for segment in segments if segment.strip()]
+
+    return claim_parts
+
+
+def clean_split_list(split_list):
+    """Cleans a list of split claim elements based on the given rules."""
+    if split_list:
+        # Rule (a): Remove first element if it starts with a number
+        if re.match(r'^\d+\.*$', split_list[0]):
+            split_list.pop(0)
+
+        # Rule (b): Remove last element if it is "." or ","
+        if split_list and split_list[-1] in {".", ","}:
+            split_list.pop()
+
+        # Rule (c): Remove leading ": ", ", " if at the beginning of an element
+        split_list = [re.sub(r'^[,:;]\s*', '', elem) for elem in split_list]
+
+    return split_list
+
+
+def create_dataframe_single_claim(claim_parts, featuretable, language=DEFAULT_LANGUAGE):
+    a_list, the_list, prep_list = [], [], []
+    introducing, referring = INTRODUCING[language], REFERRING[language]
+
+    for item in claim_parts:
+        if item.startswith(introducing):
+            a_list.append(_without(item, introducing))
+        else:
+            a_list.append('')
+
+        if item.startswith(referring):
+            the_list.append(_without(item, referring))
+        else:
+            the_list.append('')
+
+        if item.startswith(introducing + referring):
+            prep_list.append('')
+        else:
+            prep_list.append(item)
+
+    i = 0
+    while i < len(prep_list):
+        item = prep_list[i]
+        for noun in featuretable:
+            if noun in item:
+                a_list.insert(i + 1, noun)
+                the_list.insert(i + 1, '')
+                prep_list.insert(i + 1, '')
+                prep_list[i] = item.replace(noun, '').strip()
+                i += 1
+                break
+        i += 1
+
+    # Ensure DataFrame always has the required columns
+    df = pd.DataFrame({'a_list': a_list, 'prep_list': prep_list, 'the_list': the_list})
+
+    # Ensure DataFrame is not empty
+    if df.empty:
+        df = pd.DataFrame({'a_list': [""], 'prep_list': [""], 'the_list': [""]})
+
+    df = df[df['a_list'].str.strip().astype(bool) | df['prep_list'].str.strip().astype(bool) | df['the_list'].str.strip().astype(bool)]
+    df.reset_index(drop=True, inplace=True)
+
+    return df
+
+
+def claim_rows(claim_text: str, features: list[str]) -> dict:
+    """The a_list/prep_list/the_list columns of one claim, segmented by the determiners of its language."""
+    parts = clean_split_list(split_claims(claim_text, features))
+    df = create_dataframe_single_claim(parts, features, detect_language(claim_text))
+    return {column: df[column].tolist() for column in COLUMNS}
+
+
+def rows_by_claim(concatenated: dict) -> dict:
+    """Splits a "Concatenated DataFrame" section into the columns of each claim number."""
+    rows = {}
+    for i, claim_number in enumerate(concatenated.get("Cl_nr", [])):
+        columns = rows.setdefault(str(claim_number), {column: [] for column in COLUMNS})
+        for column in COLUMNS:
+            columns[column].append(concatenated[column][i])
+    return rows
+
+
+def diff_claims(old_claims: dict, old_features: dict, claims: list[str], features: dict) -> list[str | None]:
+    """For each new claim, the key of the stored claim with the same text and features, or None if it changed."""
+    unchanged = {}
+    for key, text in old_claims.items():
+        unchanged.setdefault((text, tuple(old_features.get(key, []))), key)
+    return [unchanged.get((text, tuple(features.get(i, [])))) for i, text in enumerate(claims)]
+
+
+def update_concatenated(saved_data: dict, claims: list[str], features: dict) -> tuple[dict, list[int]]:
+    """Concatenated DataFrame of the new claims, re-segmenting only changed claims.
+
+    Returns the section and the indices of the claims that were segmented again."""
+    matches = diff_claims(saved_data.get("User Entered Claims", {}), saved_data.get("Feature Table", {}), claims, features)
+    old_rows = rows_by_claim(saved_data.get("Concatenated DataFrame", {}))
+
+    concatenated = {column: [] for column in COLUMNS + ("Cl_nr",)}
+    changed = []
+    for i, (claim_text, old_key) in enumerate(zip(claims, matches)):
+        rows = old_rows.get(old_key.split("_")[-1]) if old_key else None
+        if rows is None:
+            rows = claim_rows(claim_text, features.get(i, []))
+            changed.append(i)
+        for column in COLUMNS:
+            concatenated[column].extend(rows[column])
+        concatenated["Cl_nr"].extend([str(i + 1)] * len(rows["a_list"]))
+    return concatenated, changed
+
+
+def concatenated_frame(concatenated: dict) -> pd.DataFrame:
+    """DataFrame of a "Concatenated DataFrame" section, as used to build the claim graph."""
+    columns = COLUMNS + ("Cl_nr",)
+    length = max((len(concatenated.get(column, [])) for column in columns), default=0)
+    return pd.DataFrame({
+        column: list(concatenated.get(column, [])) + [''] * (length - len(concatenated.get(column, [])))
+        for column in columns
+    })
@@ -0,0 +1,390 @@
+"""Golden outputs of the claim pipeline, to guard rewrites of its stages.
+
+For every corpus (test_set.txt, claims_test.txt, New Text Document (2).txt and
+the data/* summaries) the outputs of the baseline implementations, the
+reference copies in utils.golden_reference, are kept in golden/<corpus>.json:
+extracted features (text corpora, per engine), the "Concatenated DataFrame",
+the claim graph and the "Markers". The current code is checked against them,
+and can also be run side by side with the reference copies on the corpora and
+on randomized synthetic claims. Differences are reported per stage and
+structure (claims, rows, nodes, edges, branches).
+
+Summaries without claims, such as data/BBB, give the pipeline no input and
+have no golden file. Features of the text corpora are only captured for an
+engine whose model is installed; check names the corpora that have no golden
+file for the default engine (spaCy, which needs en_core_web_sm).
+
+Deliberate changes of behaviour are listed in INTENDED: a case whose outputs
+match the reference outputs with one of these changes applied is reported as
+intended, and only other differences make the commands exit with 1.
+
+    python -m utils.golden update [--engine rules]      # capture the baseline outputs
+    python -m utils.golden check                        # current code against the golden files
+    python -m utils.golden compare [--synthetic 200]    # reference copies against current code
+"""
+import argparse
+import json
+import random
+import re
+import sys
+from collections import OrderedDict
+from pathlib import Path
+
+from utils import golden_reference as reference
+from utils.claims import split_claim_lines
+from utils.engine_accuracy import TEXT_CORPORA
+from utils.features import concatenated_frame, update_concatenated
+from utils.graph import create_graph, graph_from_network, intern_column, network_section
+from utils.nlp import DEFAULT_ENGINE, MODEL_NAME, dedupe_chunks, get_engine, load_model
+from utils.reachability import ReachabilityIndex, generate_markers_dict
+from utils.storage import iter_applications, read_summary
+from utils.vocabulary import FeatureVocabulary
+
+GOLDEN_DIR = Path("golden")
+MAX_SHOWN = 5                                       # Examples listed per difference
+
+
+def slug(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "_", name).strip("_")
+
+
+def graph_record(G) -> dict:
+    """Nodes with colors and edges with labels, in insertion order."""
+    return {
+        "nodes": [[node, color] for node, color in G.nodes(data="color")],
+        "edges": [[u, v, label] for u, v, label in G.edges(data="label")],
+    }
+
+
+def current_features(claims: list[str], engine: str) -> list[list[str]]:
+    return [dedupe_chunks(chunks) for chunks in get_engine(engine).chunks(claims)]
+
+
+def baseline_features(claims: list[str], engine: str) -> list[list[str]]:
+    """Features as the baseline extracted them: spaCy through the reference copy; engines
+    added since then have their raw phrases deduplicated the way the baseline did."""
+    if engine == "spacy":
+        nlp = load_model(MODEL_NAME)
+        return [reference.extract_noun_chunks(claim, nlp) for claim in claims]
+    return [list(OrderedDict.fromkeys(chunks)) for chunks in get_engine(engine).chunks(claims)]
+
+
+def current_pipeline(claims: list[str], features: list[list[str]], network: dict | None = None) -> dict:
+    """Outputs of the current implementations; markers come from network if given (a saved,
+    possibly hand-edited network), else from the generated graph."""
+    concatenated, _ = update_concatenated({}, claims, dict(enumerate(features)))
+    G = create_graph(concatenated_frame(concatenated), FeatureVocabulary())
+    network = network or network_section(G)
+    markers = generate_markers_dict(network, ReachabilityIndex(graph_from_network(network)))
+    return {"concatenated": concatenated, "graph": graph_record(G), "markers": markers}
+
+
+def reference_graph(concatenated: dict, network: dict | None = None, change=None) -> dict:
+    """Graph and markers of the reference copies, with an INTENDED change applied to the frame."""
+    frame = concatenated_frame(concatenated)
+    G = reference.create_graph(change(frame) if change else frame)
+    network = network or network_section(G)
+    markers = reference.generate_markers_dict(network, reference.create_graph_from_network_data(network))
+    return {"graph": graph_record(G), "markers": markers}
+
+
+def reference_pipeline(claims: list[str], features: list[list[str]], network: dict | None = None) -> dict:
+    """The same outputs from the reference copies."""
+    saved_data = {
+        "User Entered Claims": {f"Cl_{i+1}": claim for i, claim in enumerate(claims)},
+        "Feature Table": {f"Cl_{i+1}": claim_features for i, claim_features in enumerate(features)},
+    }
+    concatenated = reference.generate_concatenated_dataframe(saved_data)
+    return {"concatenated": concatenated, **reference_graph(concatenated, network)}
+
+
+# Intended changes
+
+def merge_variants(frame):
+    """Features that differ only in determiner, case, spacing or plural are one node,
+    named after their first surface form (the canonical vocabulary)."""
+    vocabulary = FeatureVocabulary()
+    frame = frame.copy()
+    for column in ("a_list", "the_list"):           # In the order create_graph interns them
+        ids = intern_column(frame[column], vocabulary)
+        frame[column] = [vocabulary.surface(i) if i >= 0 else value for i, value in zip(ids, frame[column])]
+    return frame
+
+
+INTENDED = {
+    "feature variants merged by the vocabulary": merge_variants,
+}
+
+
+def classify(expected: dict, output: dict, network: dict | None = None) -> tuple[str, list[str]]:
+    """'same', 'intended: <change>' or 'DIFFERENT', with the differences to the reference outputs."""
+    lines = diff_outputs(expected, output)
+    if not lines:
+        return "same", []
+    if "features" not in expected or expected["features"] == output.get("features"):
+        for name, change in INTENDED.items():
+            changed = {**expected, **reference_graph(expected["concatenated"], network, change)}
+            if not diff_outputs(changed, output):
+                return f"intended: {name}", lines
+    return "DIFFERENT", lines
+
+
+# Corpora
+
+def text_corpora() -> list[tuple[str, list[str]]]:
+    return [
+        (slug(Path(name).stem), split_claim_lines(Path(name).read_text(encoding="utf-8")))
+        for name in TEXT_CORPORA if Path(name).is_file()
+    ]
+
+
+def summary_corpora() -> list[tuple[str, list[str], list[list[str]], dict | None]]:
+    """(name, claims, stored spaCy features, stored network) of every summary with claims;
+    summaries without claims are left out."""
+    result = []
+    for filename in iter_applications():
+        data = read_summary(filename)
+        claims = data.get("User Entered Claims", {})
+        if claims:
+            stored = data.get("Feature Table", {})
+            result.append((
+                f"data_{slug(filename)}", list(claims.values()),
+                [list(stored.get(key, [])) for key in claims], data.get("Network") or None
+            ))
+    return result
+
+
+NOUNS = [
+    "housing", "lid", "sensor", "shaft", "motor", "valve", "spring", "bearing", "frame",
+    "clamp", "wheel adapter element", "control unit", "loading arrangement", "holding device",
+]
+RELATIONS = ["comprising", "connected to", "arranged on", "mounted in", "coupled with", "having"]
+
+
+def synthetic_claims(count: int, seed: int) -> list[tuple[list[str], list[list[str]]]]:
+    """Random claim sets with their raw phrases: an independent claim introducing
+    features, dependent claims referring back to them (sometimes in the plural)."""
+    rng = random.Random(seed)
+    sets = []
+    for _ in range(count):
+        nouns = rng.sample(NOUNS, rng.randint(3, len(NOUNS)))
+        head, parts = nouns[0], nouns[1:rng.randint(2, len(nouns) - 1)]
+        claims = [f"1. A {head} comprising " + ", ".join(
+            f"a {noun} {rng.choice(RELATIONS)} the {rng.choice([head] + parts[:i])}" if i else f"a {noun}"
+            for i, noun in enumerate(parts)
+        ) + "."]
+        features = [[f"A {head}"] + [f"a {noun}" for noun in parts] + [f"the {noun}" for noun in [head] + parts]]
+        introduced = [head] + parts
+        for number in range(2, rng.randint(2, 6)):
+            old = rng.choice(introduced)
+            new = rng.choice([noun for noun in NOUNS if noun not in introduced] or NOUNS)
+            referred = old + "s" if rng.random() < 0.2 else old
+            claims.append(f"{number}. The {head} of claim {rng.randint(1, number - 1)}, "
+                          f"wherein the {referred} is {rng.choice(RELATIONS)} a {new}.")
+            features.append([f"The {head}", f"the {referred}", f"a {new}"])
+            introduced.append(new)
+        sets.append((claims, features))
+    return sets
+
+
+# Structural differences
+
+def _examples(items) -> str:
+    items = list(items)
+    shown = ", ".join(repr(item) for item in items[:MAX_SHOWN])
+    return shown + (f" (+{len(items) - MAX_SHOWN} more)" if len(items) > MAX_SHOWN else "")
+
+
+def diff_features(old: list[list[str]], new: list[list[str]]) -> list[str]:
+    lines = []
+    if len(old) != len(new):
+        lines.append(f"features: {len(old)} claims -> {len(new)}")
+    for i, (a, b) in enumerate(zip(old, new)):
+        if a == b:
+            continue
+        missing, extra = [x for x in a if x not in b], [x for x in b if x not in a]
+        if missing or extra:
+            lines.append(f"features Cl_{i+1}: missing {_examples(missing) or '-'}; extra {_examples(extra) or '-'}")
+        else:
+            lines.append(f"features Cl_{i+1}: same phrases, different order")
+    return lines
+
+
+def diff_concatenated(old: dict, new: dict) -> list[str]:
+    columns = ("a_list", "prep_list", "the_list", "Cl_nr")
+    rows_old, rows_new = (list(zip(*(frame.get(c, []) for c in columns))) for frame in (old, new))
+    if rows_old == rows_new:
+        return []
+    lines = [f"concatenated: {len(rows_old)} rows -> {len(rows_new)}"] if len(rows_old) != len(rows_new) else []
+    first = next((i for i, (a, b) in enumerate(zip(rows_old, rows_new)) if a != b), min(len(rows_old), len(rows_new)))
+    lines.append(f"concatenated row {first}: {rows_old[first] if first < len(rows_old) else '-'} "
+                 f"-> {rows_new[first] if first < len(rows_new) else '-'}")
+    return lines
+
+
+def diff_graph(old: dict, new: dict) -> list[str]:
+    lines = []
+    nodes_old, nodes_new = dict(map(tuple, old["nodes"])), dict(map(tuple, new["nodes"]))
+    edges_old = {(u, v): label for u, v, label in old["edges"]}
+    edges_new = {(u, v): label for u, v, label in new["edges"]}
+    if nodes_old.keys() - nodes_new.keys():
+        lines.append(f"graph nodes removed: {_examples(nodes_old.keys() - nodes_new.keys())}")
+    if nodes_new.keys() - nodes_old.keys():
+        lines.append(f"graph nodes added: {_examples(nodes_new.keys() - nodes_old.keys())}")
+    recolored = [node for node in nodes_old.keys() & nodes_new.keys() if nodes_old[node] != nodes_new[node]]
+    if recolored:
+        lines.append(f"graph nodes recolored: {_examples(recolored)}")
+    if edges_old.keys() - edges_new.keys():
+        lines.append(f"graph edges removed: {_examples(edges_old.keys() - edges_new.keys())}")
+    if edges_new.keys() - edges_old.keys():
+        lines.append(f"graph edges added: {_examples(edges_new.keys() - edges_old.keys())}")
+    relabelled = [edge for edge in edges_old.keys() & edges_new.keys() if edges_old[edge] != edges_new[edge]]
+    if relabelled:
+        lines.append(f"graph edges relabelled: {_examples(relabelled)}")
+    if not lines and (old["nodes"] != new["nodes"] or old["edges"] != new["edges"]):
+        lines.append("graph: same nodes and edges, different order")
+    return lines
+
+
+def diff_markers(old: dict, new: dict) -> list[str]:
+    lines = []
+    for key in ("Combinations", "Heads"):
+        if old.get(key) != new.get(key):
+            a, b = old.get(key, []), new.get(key, [])
+            lines.append(f"markers {key}: removed {_examples([x for x in a if x not in b]) or '-'}; "
+                         f"added {_examples([x for x in b if x not in a]) or '-'}")
+    branches_old, branches_new = old.get("Branches", {}), new.get("Branches", {})
+    for head in list(branches_old) + [head for head in branches_new if head not in branches_old]:
+        a, b = branches_old.get(head, []), branches_new.get(head, [])
+        if a == b:
+            continue
+        missing, extra = set(a) - set(b), set(b) - set(a)
+        if missing or extra:
+            lines.append(f"markers branches of {head!r}: {len(a)} -> {len(b)}, "
+                         f"missing {_examples(sorted(missing)) or '-'}; extra {_examples(sorted(extra)) or '-'}")
+        else:
+            lines.append(f"markers branches of {head!r}: same branches, different order")
+    return lines
+
+
+def diff_outputs(old: dict, new: dict) -> list[str]:
+    lines = []
+    if "features" in old or "features" in new:
+        lines += diff_features(old.get("features", []), new.get("features", []))
+    lines += diff_concatenated(old["concatenated"], new["concatenated"])
+    lines += diff_graph(old["graph"], new["graph"])
+    lines += diff_markers(old["markers"], new["markers"])
+    return lines
+
+
+# Commands
+
+def golden_outputs(engine: str) -> dict:
+    """Corpus name -> baseline outputs; text corpora need the engine's model."""
+    outputs = {}
+    for name, claims in text_corpora():
+        try:
+            features = baseline_features(claims, engine)
+        except OSError as e:                        # Model package not installed
+            print(f"{name + '.' + engine:<40}skipped: {e}")
+            continue
+        outputs[f"{name}.{engine}"] = {"engine": engine, "claims": claims, "features": features,
+                                       **reference_pipeline(claims, features)}
+    for name, claims, features, network in summary_corpora():
+        outputs[name] = {"claims": claims, "input_features": features, "network": network,
+                         **reference_pipeline(claims, features, network)}
+    return outputs
+
+
+def update(engine: str) -> int:
+    GOLDEN_DIR.mkdir(exist_ok=True)
+    for name, output in golden_outputs(engine).items():
+        with open(GOLDEN_DIR / f"{name}.json", "w", encoding="utf-8") as f:
+            json.dump(output, f, indent=1, ensure_ascii=False)
+        print(f"{name:<40}written")
+    return 0
+
+
+def report(name: str, status: str, lines: list[str]) -> None:
+    print(f"{name:<40}{status}")
+    for line in lines:
+        print(f"    {line}")
+
+
+def check() -> int:
+    """Runs the current code on the inputs of every golden file; 1 if an output changed unintendedly."""
+    failed = 0
+    for path in sorted(GOLDEN_DIR.glob("*.json")):
+        with open(path, "r", encoding="utf-8") as f:
+            golden = json.load(f)
+        claims = golden["claims"]
+        if "engine" in golden:
+            try:
+                features = current_features(claims, golden["engine"])
+            except OSError as e:                    # Model package not installed
+                print(f"{path.stem:<40}skipped: {e}")
+                continue
+            output = {"features": features, **current_pipeline(claims, features)}
+        else:
+            output = current_pipeline(claims, golden["input_features"], golden["network"])
+        status, lines = classify(golden, output, golden.get("network"))
+        report(path.stem, "ok" if status == "same" else status, lines)
+        failed += status == "DIFFERENT"
+    for name, _ in text_corpora():
+        if not (GOLDEN_DIR / f"{name}.{DEFAULT_ENGINE}.json").is_file():
+            report(f"{name}.{DEFAULT_ENGINE}", f"missing: run 'update --engine {DEFAULT_ENGINE}' with its model installed", [])
+    return 1 if failed else 0
+
+
+def compare(engine: str, synthetic: int, seed: int) -> int:
+    """Reference copies against the current code; 1 if any output differs unintendedly."""
+    cases = []
+    for name, claims in text_corpora():
+        try:
+            expected, features = baseline_features(claims, engine), current_features(claims, engine)
+        except OSError as e:                        # Model package not installed
+            print(f"{name:<40}skipped: {e}")
+            continue
+        cases.append((name, claims, None, expected, features))
+    for name, claims, features, network in summary_corpora():
+        cases.append((name, claims, network, features, features))
+    for i, (claims, phrases) in enumerate(synthetic_claims(synthetic, seed)):
+        expected = [list(OrderedDict.fromkeys(claim_phrases)) for claim_phrases in phrases]
+        cases.append((f"synthetic_{seed}_{i}", claims, None, expected, [dedupe_chunks(p) for p in phrases]))
+
+    counts = {}
+    for name, claims, network, expected, features in cases:
+        status, lines = classify(
+            {"features": expected, **reference_pipeline(claims, expected, network)},
+            {"features": features, **current_pipeline(claims, features, network)},
+            network,
+        )
+        counts[status] = counts.get(status, 0) + 1
+        if status == "DIFFERENT" or not name.startswith("synthetic"):
+            report(name, status, lines)
+    print(f"{len(cases)} cases ({synthetic} synthetic, seed {seed}): "
+          + ", ".join(f"{count} {status}" for status, count in sorted(counts.items())))
+    return 1 if counts.get("DIFFERENT") else 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Golden outputs of the claim pipeline.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    update_parser = commands.add_parser("update", help="Capture the outputs of the current code")
+    update_parser.add_argument("--engine", default=DEFAULT_ENGINE)
+    commands.add_parser("check", help="Compare the current code to the golden files")
+    compare_parser = commands.add_parser("compare", help="Compare the reference copies to the current code")
+    compare_parser.add_argument("--engine", default=DEFAULT_ENGINE)
+    compare_parser.add_argument("--synthetic", type=int, default=200, help="Number of random claim sets")
+    compare_parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.command == "update":
+        return update(args.engine)
+    if args.command == "check":
+        return check()
+    return compare(args.engine, args.synthetic, args.seed)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+"""Reference copies of the claim pipeline as first written in the pages.
+
+Kept verbatim apart from file access (the functions take the loaded data
+instead of an application name) and the spaCy model, which is passed in.
+utils.golden runs them side by side with the current implementations.
+"""
+import re
+from collections import OrderedDict
+from itertools import cycle
+
+import networkx as nx
+import pandas as pd
+
+
+def extract_noun_chunks(claim: str, nlp) -> list[str]:
+    """Extracts noun chunks in their original order of appearance, removing duplicates."""
+    doc = nlp(claim)
+    
+    chunks = [
+        chunk.text for chunk in doc.noun_chunks
+        if len(chunk) > 1 and all(token.is_alpha or token.is_digit or token.text in {'(', ')', ','} for token in chunk)
+    ]
+    
+    # Use OrderedDict to remove duplicates while maintaining order of appearance
+    return list(OrderedDict.fromkeys(chunks))
+
+
+def split_claims(claim_text, featuretable):
+    """Splits claim text based on its features"""
+    claim_text = re.sub(r'\s+', ' ', claim_text.strip())  
+
+    # If no features are provided, return the entire claim_text as a single element
+    if not featuretable:
+        return [claim_text]
+
+    # Create a regex pattern to match any compound noun phrase
+    compound_pattern = '|'.join(map(re.escape, featuretable))
+
+    # Split claim text using the compound noun phrases
+    segments = re.split(f"({compound_pattern})", claim_text)
+
+    # Filter out empty or whitespace-only segments
+    claim_parts = [segment.strip() for segment in segments if segment.strip()]
+
+    return claim_parts  
+
+def clean_split_list(split_list):
+    """Cleans a list of split claim elements based on the given rules."""
+    if split_list:
+        # Rule (a): Remove first element if it starts with a number
+        if re.match(r'^\d+\.*$', split_list[0]):
+            split_list.pop(0)
+
+        # Rule (b): Remove last element if it is "." or ","
+        if split_list and split_list[-1] in {".", ","}:
+            split_list.pop()
+
+        # Rule (c): Remove leading ": ", ", " if at the beginning of an element
+        split_list = [re.sub(r'^[,:;]\s*', '', elem) for elem in split_list]
+
+    return split_list
+
+def create_dataframe_single_claim(claim_parts, featuretable):     
+    a_list, the_list, prep_list = [], [], []
+
+    for item in claim_parts:
+        if item.startswith(('A ', 'a ', 'An ', 'an ')):
+            a_list.append(item.split(' ', 1)[1])  
+        else:
+            a_list.append('')  
+
+        if item.startswith(('The ', 'the ', 'said ')):
+            the_list.append(item.split(' ', 1)[1])  
+        else:
+            the_list.append('')  
+
+        if item.startswith(('A ', 'a ', 'An ', 'an ', 'The ', 'the ', 'said ')):
+            prep_list.append('')
+        else:
+            prep_list.append(item)
+
+    i = 0
+    while i < len(prep_list):
+        item = prep_list[i]
+        for noun in featuretable:
+            if noun in item:
+                a_list.insert(i + 1, noun)
+                the_list.insert(i + 1, '')
+                prep_list.insert(i + 1, '')                                                 
+                prep_list[i] = item.replace(noun, '').strip()                               
+                i += 1                                                                      
+                break
+        i += 1                                                                             
+
+    # Ensure DataFrame always has the required columns
+    df = pd.DataFrame({'a_list': a_list, 'prep_list': prep_list, 'the_list': the_list})
+
+    # Fill missing values if any
+    for col in ['a_list', 'prep_list', 'the_list']:
+        if col not in df.columns:
+            df[col] = ""
+
+    # Ensure DataFrame is not empty
+    if df.empty:
+        df = pd.DataFrame({'a_list': [""], 'prep_list': [""], 'the_list': [""]})
+
+    df = df[df['a_list'].str.strip().astype(bool) | df['prep_list'].str.strip().astype(bool) | df['the_list'].str.strip().astype(bool)]
+    df.reset_index(drop=True, inplace=True)
+
+    return df 
+
+def generate_concatenated_dataframe(saved_data: dict) -> dict:
+    """Generates a concatenated DataFrame from saved claims and their feature tables, including claim number."""
+
+    original_claims = saved_data.get("User Entered Claims", {})
+    feature_table = saved_data.get("Feature Table", {})
+
+    dataframe_storage = {}  # Store DataFrames as dictionaries
+    combined_df = pd.DataFrame()  # Final concatenated DataFrame
+
+    for claim_key, claim_text in original_claims.items():
+        claim_number = claim_key.split("_")[-1]  # Extract claim number
+        features = feature_table.get(claim_key, [])
+        split_result = split_claims(claim_text, features)
+        cleaned_result = clean_split_list(split_result)
+
+        df_claim = create_dataframe_single_claim(cleaned_result, features)
+
+        if not df_claim.empty:
+            df_claim["Cl_nr"] = claim_number  # Add claim number as a new column
+            dataframe_storage[claim_key] = df_claim.to_dict(orient="list")  # Convert DataFrame to dictionary
+
+    # Combine all DataFrames
+    for claim_key, df_dict in dataframe_storage.items():
+        df = pd.DataFrame(df_dict)
+        if df.empty:
+            continue  # Skip empty DataFrames
+
+        combined_df = pd.concat([combined_df, df], ignore_index=True)
+
+    # If the combined DataFrame is empty, return an empty structure
+    if combined_df.empty or not {"a_list", "prep_list", "the_list", "Cl_nr"}.issubset(combined_df.columns):
+        return {"a_list": [], "prep_list": [], "the_list": [], "Cl_nr": []}
+
+    return {
+        "a_list": combined_df["a_list"].tolist(),
+        "prep_list": combined_df["prep_list"].tolist(),
+        "the_list": combined_df["the_list"].tolist(),
+        "Cl_nr": combined_df["Cl_nr"].tolist(),
+    }
+
+def create_graph(df):
+    G = nx.DiGraph()
+    
+    color_cycle = cycle([
+        "red", "orange", "lime", "turquoise", "hotpink", "khaki", "blue", 
+        "green", "yellow", "violet", "coral", "pink", "steelblue", "salmon", 
+        "tomato", "springgreen"
+    ])
+    
+    # Assign colors based on first appearance in 'a_list'
+    node_colors = {}
+    claim_colors = {}
+    
+    for idx, row in df.iterrows():
+        node = row['a_list']
+        claim = row['Cl_nr']
+        
+        if pd.notna(node) and node.strip():
+            if node not in node_colors:
+                if claim not in claim_colors:
+                    claim_colors[claim] = next(color_cycle)
+                node_colors[node] = claim_colors[claim]
+
+    # Add nodes with their assigned colors
+    for node, color in node_colors.items():
+        G.add_node(node, color=color)
+    
+    # Add edges based on both old and new logic
+    for i in range(len(df) - 2):
+        node_a = None
+        node_b = None
+        edge_label = df.at[i + 1, 'prep_list'] if pd.notna(df.at[i + 1, 'prep_list']) else ""
+        
+        # Condition (a): 'a_list[i]' is a string, 'the_list[i+2]' is empty, 'a_list[i+2]' is a string
+        if pd.notna(df.at[i, 'a_list']) and df.at[i, 'a_list'].strip():
+            if pd.isna(df.at[i + 2, 'the_list']) or not df.at[i + 2, 'the_list'].strip():
+                if pd.notna(df.at[i + 2, 'a_list']) and df.at[i + 2, 'a_list'].strip():
+                    node_a = df.at[i, 'a_list']
+                    node_b = df.at[i + 2, 'a_list']
+        
+        # Condition (b): 'the_list[i]' is a string, 'a_list[i+2]' is a string
+        elif pd.notna(df.at[i, 'the_list']) and df.at[i, 'the_list'].strip():
+            if pd.notna(df.at[i + 2, 'a_list']) and df.at[i + 2, 'a_list'].strip():
+                node_a = next((n for n in df['a_list'] if n == df.at[i, 'the_list']), None)
+                node_b = df.at[i + 2, 'a_list']
+        
+        if node_a and node_b:
+            G.add_edge(node_a, node_b, label=edge_label)
+
+    # Identify the first node in a_list (assuming it's the first non-empty string)
+    first_node = next((node for node in df['a_list'] if pd.notna(node) and node.strip()), None)
+
+    # Connect first node to other nodes in 'a_list' if no edge exists in 'the_list'
+    if first_node:
+        for node in df['a_list']:
+            if node and node != first_node:
+                has_edge = any(G.has_edge(node, other) for other in df['the_list'])
+                if not has_edge:
+                    G.add_edge(first_node, node)
+
+    # Ensure all nodes have a subset attribute (default to 0 if missing)
+    nx.set_node_attributes(G, {node: 0 for node in G.nodes}, "subset")
+
+    return G
+
+# Create the network graph from the given network data
+def create_graph_from_network_data(network_data):
+    G = nx.DiGraph()
+    
+    # Add nodes with their colors as node attributes
+    for node in network_data.get('nodes', []):
+        G.add_node(node['id'], color=node['color'])
+    
+    # Add edges between nodes
+    for edge in network_data.get('edges', []):
+        G.add_edge(edge['source'], edge['target'], label=edge.get('label', ''))
+    
+    return G
+
+# Extract head nodes (nodes with no incoming edges)
+def find_head_nodes(G):
+    return [node for node in G.nodes if G.in_degree(node) == 0]
+
+# Find all branches starting from a specific node and filter out branches of length <= 1
+def find_all_branches(G, start_node):
+    branches = []
+    
+    def dfs(current_path):
+        current_node = current_path[-1]
+        # Explore all neighbors (children in a directed graph)
+        for neighbor in G.neighbors(current_node):
+            if neighbor not in current_path:  # Avoid cycles
+                dfs(current_path + [neighbor])
+        # If no neighbors, the branch is complete, only add it if length > 1
+        if len(current_path) > 1:
+            branches.append(current_path)
+    
+    dfs([start_node])
+    return branches
+
+# Generate a dictionary for the "Markers" field
+def generate_markers_dict(network_data, G):
+    head_nodes = find_head_nodes(G)
+    
+    # Find all branches, but only include those with more than 1 element in the branch
+    all_branches = {head_node: find_all_branches(G, head_node) for head_node in head_nodes}
+
+    # Generate "Combinations" (list of node IDs)
+    combinations = [node['id'] for node in network_data.get("nodes", [])]
+
+    # Format the branches for display, filtering out those with one or fewer elements
+    branches_info = {
+        head_node: [
+            f"10UG ({', '.join(branch)})" for branch in branches if len(branch) > 1  # Only keep branches with length > 1
+        ]
+        for head_node, branches in all_branches.items() if any(len(branch) > 1 for branch in branches)  # Only include head nodes with valid branches
+    }
+
+    # Construct the dictionary to return
+    markers_dict = {
+        "Combinations": combinations,
+        "Heads": head_nodes,
+        "Branches": branches_info
+    }
+
+    return markers_dict
@@ -0,0 +1,296 @@
+from array import array
+from itertools import cycle
+
+import networkx as nx
+import pandas as pd
+
+from utils.vocabulary import FeatureVocabulary, split_determiner
+
+CLAIM_COLORS = [
+    "red", "orange", "lime", "turquoise", "hotpink", "khaki", "blue",
+    "green", "yellow", "violet", "coral", "pink", "steelblue", "salmon",
+    "tomato", "springgreen"
+]
+
+
+def pack_graph(G: nx.DiGraph) -> dict:
+    """Compact form of a claim graph: node and color tuples plus int edge arrays."""
+    nodes = tuple(G.nodes)
+    index = {node: i for i, node in enumerate(nodes)}
+    return {
+        "nodes": nodes,
+        "colors": tuple(G.nodes[node].get("color", "lightblue") for node in nodes),
+        "src": array("i", (index[u] for u, _ in G.edges)),
+        "dst": array("i", (index[v] for _, v in G.edges)),
+        "labels": tuple(label for _, _, label in G.edges(data="label", default="")),
+    }
+
+
+def unpack_graph(packed: dict) -> nx.DiGraph:
+    G = nx.DiGraph()
+    nodes = packed["nodes"]
+    for node, color in zip(nodes, packed["colors"]):
+        G.add_node(node, color=color)
+    for u, v, label in zip(packed["src"], packed["dst"], packed["labels"]):
+        G.add_edge(nodes[u], nodes[v], label=label)
+    return G
+
+
+def graph_from_network(network: dict) -> nx.DiGraph:
+    """Rebuilds a graph from a saved "Network" section."""
+    G = nx.DiGraph()
+    for node in network.get("nodes", []):
+        G.add_node(node["id"], color=node.get("color", "lightblue"))
+    for edge in network.get("edges", []):
+        G.add_edge(edge["source"], edge["target"], label=edge.get("label", ""))
+    return G
+
+
+def network_section(G: nx.DiGraph) -> dict:
+    """The "Network" section saved for a graph."""
+    return {
+        "nodes": [{"id": node, "color": G.nodes[node].get("color", "lightblue")} for node in G.nodes if node != ""],
+        "edges": [
+            {"source": u, "target": v, "label": G.edges[u, v].get("label", "")}
+            for u, v in G.edges if u != "" and v != ""
+        ],
+    }
+
+
+def _text(value) -> str:
+    return value if isinstance(value, str) else ""
+
+
+def intern_column(values, vocabulary: FeatureVocabulary) -> array:
+    """Feature IDs of a dataframe column, -1 for empty cells."""
+    ids = array("i")
+    for value in values:
+        feature_id = vocabulary.intern(_text(value))
+        ids.append(-1 if feature_id is None else feature_id)
+    return ids
+
+
+def assign_colors(a_ids: array, claims: list) -> tuple[dict, dict]:
+    """Colors based on first appearance in 'a_list': node ID -> color and claim -> color.
+
+    A claim takes the next color only if it introduces a new feature."""
+    color_cycle = cycle(CLAIM_COLORS)
+    node_colors = {}
+    claim_colors = {}
+    for node, claim in zip(a_ids, claims):
+        if node >= 0 and node not in node_colors:
+            if claim not in claim_colors:
+                claim_colors[claim] = next(color_cycle)
+            node_colors[node] = claim_colors[claim]
+    return node_colors, claim_colors
+
+
+def claims_by_color(df: pd.DataFrame, vocabulary: FeatureVocabulary | None = None) -> dict[str, list]:
+    """Claims each node color of create_graph stands for (colors repeat after 16 claims)."""
+    _, claim_colors = assign_colors(intern_column(df["a_list"], vocabulary or FeatureVocabulary()), list(df["Cl_nr"]))
+    claims = {}
+    for claim, color in claim_colors.items():
+        claims.setdefault(color, []).append(claim)
+    return claims
+
+
+def create_graph(df: pd.DataFrame, vocabulary: FeatureVocabulary | None = None) -> nx.DiGraph:
+    """Builds the claim graph from the concatenated dataframe.
+
+    Features are compared as vocabulary IDs, so 'wheel' and 'wheels' become one
+    node; nodes are labelled with the first form of each feature in df, not the
+    one stored in the vocabulary, which may come from claims since amended."""
+    if vocabulary is None:
+        vocabulary = FeatureVocabulary()
+
+    a_ids = intern_column(df["a_list"], vocabulary)
+    the_ids = intern_column(df["the_list"], vocabulary)
+    labels = [_text(value) for value in df["prep_list"]]
+    claims = list(df["Cl_nr"])
+
+    node_colors, _ = assign_colors(a_ids, claims)
+    introduced = set(node_colors)
+
+    edges = {}                                      # (a, b) -> label, in insertion order
+    for i in range(len(a_ids) - 2):
+        node_a = node_b = -1
+        # Condition (a): 'a_list[i]' is a feature, 'the_list[i+2]' is empty, 'a_list[i+2]' is a feature
+        if a_ids[i] >= 0:
+            if the_ids[i + 2] < 0 and a_ids[i + 2] >= 0:
+                node_a, node_b = a_ids[i], a_ids[i + 2]
+        # Condition (b): 'the_list[i]' refers back to an introduced feature, 'a_list[i+2]' is a feature
+        elif the_ids[i] >= 0 and a_ids[i + 2] >= 0:
+            if the_ids[i] in introduced:
+                node_a, node_b = the_ids[i], a_ids[i + 2]
+        if node_a >= 0 and node_b >= 0:
+            edges[(node_a, node_b)] = labels[i + 1]
+
+    # Connect the first feature to every feature that does not point back to a referenced one
+    first_node = next((node for node in a_ids if node >= 0), -1)
+    if first_node >= 0:
+        referenced = set(the_ids)
+        successors = {}
+        for u, v in edges:
+            successors.setdefault(u, set()).add(v)
+        for node in a_ids:
+            if node >= 0 and node != first_node and not successors.get(node, set()) & referenced:
+                if (first_node, node) not in edges:
+                    edges[(first_node, node)] = None
+                    successors.setdefault(first_node, set()).add(node)
+
+    surfaces = {}                                   # ID -> first form in a_list; every node is introduced there
+    for node, value in zip(a_ids, df["a_list"]):
+        if node >= 0 and node not in surfaces:
+            surfaces[node] = split_determiner(value)[1].strip()
+
+    G = nx.DiGraph()
+    for node, color in node_colors.items():
+        G.add_node(surfaces[node], color=color)
+    for (u, v), label in edges.items():
+        if label is None:
+            G.add_edge(surfaces[u], surfaces[v])
+        else:
+            G.add_edge(surfaces[u], surfaces[v], label=label)
+
+    # Ensure all nodes have a subset attribute (default to 0 if missing)
+    nx.set_node_attributes(G, {node: 0 for node in G.nodes}, "subset")
+
+    return G
+
+
+def int_adjacency(G: nx.DiGraph) -> tuple[list, dict, list[list[int]]]:
+    """Node list, node -> index map and successor lists of int indices."""
+    nodes = list(G.nodes)
+    index = {node: i for i, node in enumerate(nodes)}
+    adjacency = [[index[v] for v in G.successors(node)] for node in nodes]
+    return nodes, index, adjacency
+
+
+def find_all_branches(adjacency: list[list[int]], start: int) -> list[list[int]]:
+    """All simple paths from start with more than one node, as index lists."""
+    branches = []
+    on_path = [False] * len(adjacency)
+    path = [start]
+    on_path[start] = True
+
+    def dfs(current):
+        for neighbor in adjacency[current]:
+            if not on_path[neighbor]:  # Avoid cycles
+                on_path[neighbor] = True
+                path.append(neighbor)
+                dfs(neighbor)
+                path.pop()
+                on_path[neighbor] = False
+        if len(path) > 1:
+            branches.append(list(path))
+
+    dfs(start)
+    return branches
+
+
+def cluster_id(color: str) -> str:
+    return f"cluster:{color}"
+
+
+def cluster_label(color: str, claims: dict[str, list]) -> str:
+    """Claims a color stands for, from claims_by_color; the color itself for other colors."""
+    if color not in claims:
+        return color
+    return "Cl " + ", ".join(str(claim) for claim in claims[color])
+
+
+def level_of_detail(G: nx.DiGraph, max_nodes: int, expanded: set[str] = frozenset()) -> nx.DiGraph:
+    """Reduced view of a large graph for the browser.
+
+    The max_nodes nodes with the highest degree stay visible, as do all nodes of
+    the expanded color groups (one group per claim color). Every other node is
+    collapsed into one cluster node per color group; edges are redirected to the
+    clusters and duplicates merged."""
+    by_degree = sorted(G.nodes, key=lambda node: G.degree(node), reverse=True)
+    visible = set(by_degree[:max_nodes])
+    visible.update(node for node, color in G.nodes(data="color", default="lightblue") if color in expanded)
+
+    view = nx.DiGraph()
+    members = {}
+    for node, attrs in G.nodes(data=True):
+        if node in visible:
+            view.add_node(node, **attrs)
+        else:
+            members.setdefault(attrs.get("color", "lightblue"), []).append(node)
+
+    representative = {}
+    for color, nodes in members.items():
+        cid = cluster_id(color)
+        view.add_node(
+            cid, color=color, cluster=True, members=nodes,
+            label=f"{cluster_label(color)} (+{len(nodes)})",
+        )
+        representative.update({node: cid for node in nodes})
+
+    for u, v, label in G.edges(data="label", default=""):
+        source, target = representative.get(u, u), representative.get(v, v)
+        if source == target and source not in visible:
+            continue  # Edge inside a cluster
+        if view.has_edge(source, target):
+            view.edges[source, target]["count"] += 1
+            view.edges[source, target]["label"] = ""
+        else:
+            view.add_edge(source, target, label=label, count=1)
+    return view
+
+
+def _keyed_graph(G: nx.DiGraph, vocabulary: FeatureVocabulary) -> tuple[nx.DiGraph, dict]:
+    """G with its nodes keyed by vocabulary ID, and key -> first node name.
+
+    Nodes of one feature, like 'wheel' and 'wheels' in networks saved before the
+    vocabulary, become one node; names without an ID are their own key."""
+    keys = {}
+    for node in G:
+        feature_id = vocabulary.intern(node) if isinstance(node, str) else None
+        keys[node] = node if feature_id is None else feature_id
+    keyed = nx.DiGraph()
+    names = {}
+    for node, attrs in G.nodes(data=True):
+        if keys[node] not in keyed:
+            keyed.add_node(keys[node], **attrs)
+            names[keys[node]] = node
+    for u, v, attrs in G.edges(data=True):
+        if keys[u] != keys[v] and not keyed.has_edge(keys[u], keys[v]):
+            keyed.add_edge(keys[u], keys[v], **attrs)
+    return keyed, names
+
+
+def merge_graphs(base: nx.DiGraph, saved: nx.DiGraph, new: nx.DiGraph,
+                 vocabulary: FeatureVocabulary | None = None) -> nx.DiGraph:
+    """Three-way merge after the claims were amended.
+
+    base is the graph built from the old claims, saved the base graph with the
+    user's edits, new the graph built from the amended claims. What the
+    amendment changed between base and new is applied to saved; nodes and edges
+    the user added or deleted, and colors and labels the user changed, stay.
+    Nodes are compared by vocabulary ID and named as in new where they occur there."""
+    if vocabulary is None:
+        vocabulary = FeatureVocabulary()
+    base, _ = _keyed_graph(base, vocabulary)
+    saved, saved_names = _keyed_graph(saved, vocabulary)
+    new, new_names = _keyed_graph(new, vocabulary)
+    G = saved.copy()
+
+    # Features and connections the amendment removed
+    G.remove_edges_from([(u, v) for u, v in base.edges if not new.has_edge(u, v) and G.has_edge(u, v)])
+    G.remove_nodes_from([node for node in base if node not in new and node in G])
+
+    for node, color in new.nodes(data="color", default="lightblue"):
+        if node not in base:
+            if node not in G:
+                G.add_node(node, color=color)
+        elif node in G and G.nodes[node].get("color", "lightblue") == base.nodes[node].get("color", "lightblue"):
+            G.nodes[node]["color"] = color          # Claim colors shift when claims are renumbered
+
+    for u, v, label in new.edges(data="label", default=""):
+        if not base.has_edge(u, v):
+            if u in G and v in G and not G.has_edge(u, v):
+                G.add_edge(u, v, label=label)
+        elif G.has_edge(u, v) and G.edges[u, v].get("label", "") == base.edges[u, v].get("label", ""):
+            G.edges[u, v]["label"] = label
+    return nx.relabel_nodes(G, {**saved_names, **new_names})
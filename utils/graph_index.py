@@ -0,0 +1,158 @@
+"""Cross-application index of Weisfeiler-Lehman subgraph hashes.
+
+Every saved "Network" is reduced to the set of WL hashes of the neighbourhoods
+of its nodes (labelled by canonical feature). An inverted index hash -> applications
+stored under data/_index answers which past applications share feature
+sub-structures with a graph without comparing graphs pairwise.
+
+Rebuild or refresh the whole index from the repository root with:
+
+    python -m utils.graph_index
+"""
+import json
+import sys
+from collections import Counter
+from functools import lru_cache
+
+import networkx as nx
+
+from utils.graph import graph_from_network
+from utils.storage import DATA_DIR, iter_applications, read_summary, summary_path
+from utils.vocabulary import normalize
+
+INDEX_PATH = DATA_DIR / "_index" / "wl_index.json"
+# Digests differ between networkx releases, so the index is rebuilt after an upgrade
+INDEX_VERSION = f"1/networkx-{nx.__version__}"
+WL_ITERATIONS = 3
+
+
+def wl_signature(G: nx.DiGraph) -> set[str]:
+    """WL hashes of the neighbourhoods (up to WL_ITERATIONS hops) of all non-leaf nodes."""
+    labelled = nx.DiGraph()
+    for node in G.nodes:
+        labelled.add_node(node, label=normalize(str(node)))
+    labelled.add_edges_from(G.edges)
+
+    hashes = nx.weisfeiler_lehman_subgraph_hashes(
+        labelled, node_attr="label", iterations=WL_ITERATIONS, digest_size=8
+    )
+    # A leaf alone is just a shared feature name, not a shared structure
+    return {h for node, node_hashes in hashes.items() if labelled.out_degree(node) > 0 for h in node_hashes}
+
+
+def _stamp(filename: str) -> list[int] | None:
+    try:
+        stat = summary_path(filename).stat()
+    except FileNotFoundError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _empty_index() -> dict:
+    return {"version": INDEX_VERSION, "apps": {}, "postings": {}}
+
+
+@lru_cache(maxsize=1)
+def _read_index(mtime_ns: int) -> dict:
+    with open(INDEX_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_index() -> dict:
+    if not INDEX_PATH.is_file():
+        return _empty_index()
+    try:
+        index = _read_index(INDEX_PATH.stat().st_mtime_ns)
+    except json.JSONDecodeError:
+        return _empty_index()
+    return index if index.get("version") == INDEX_VERSION else _empty_index()
+
+
+def save_index(index: dict) -> None:
+    INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with open(INDEX_PATH, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+
+
+def _remove(index: dict, filename: str) -> None:
+    entry = index["apps"].pop(filename, None)
+    if not entry:
+        return
+    for h in entry["hashes"]:
+        names = index["postings"].get(h)
+        if names and filename in names:
+            names.remove(filename)
+            if not names:
+                del index["postings"][h]
+
+
+def _add(index: dict, filename: str, signature: set[str]) -> None:
+    index["apps"][filename] = {"stamp": _stamp(filename), "hashes": sorted(signature)}
+    for h in signature:
+        index["postings"].setdefault(h, []).append(filename)
+
+
+def update_application(filename: str, G: nx.DiGraph) -> None:
+    """Replaces the hashes of one application, e.g. after its network was saved."""
+    index = json.loads(json.dumps(load_index()))     # Cached index is shared, work on a copy
+    _remove(index, filename)
+    if G.number_of_edges():
+        _add(index, filename, wl_signature(G))
+    save_index(index)
+
+
+def sync_index() -> int:
+    """Re-hashes every application whose summary changed since it was indexed."""
+    index = json.loads(json.dumps(load_index()))
+    names = set(iter_applications())
+    changed = 0
+
+    for filename in list(index["apps"]):
+        if filename not in names:
+            _remove(index, filename)
+            changed += 1
+
+    for filename in sorted(names):
+        entry = index["apps"].get(filename)
+        if entry and entry["stamp"] == _stamp(filename):
+            continue
+        _remove(index, filename)
+        network = read_summary(filename).get("Network")
+        if network:
+            _add(index, filename, wl_signature(graph_from_network(network)))
+        else:
+            # Remember the stamp so unchanged applications without a network are skipped
+            index["apps"][filename] = {"stamp": _stamp(filename), "hashes": []}
+        changed += 1
+
+    if changed or not INDEX_PATH.is_file():
+        save_index(index)
+    return changed
+
+
+def related_applications(G: nx.DiGraph, exclude: str | None = None, top: int = 10) -> list[tuple[str, int, float]]:
+    """Applications sharing WL sub-structures with G as (name, shared hashes, Jaccard score)."""
+    index = load_index()
+    if not index["apps"]:
+        sync_index()                                # First use or outdated: index the whole archive once
+        index = load_index()
+    signature = wl_signature(G)
+    if not signature:
+        return []
+
+    shared = Counter()
+    for h in signature:
+        shared.update(index["postings"].get(h, ()))
+    shared.pop(exclude, None)
+
+    results = []
+    for filename, count in shared.items():
+        size = len(index["apps"].get(filename, {}).get("hashes", ()))
+        results.append((filename, count, count / (len(signature) + size - count)))
+    results.sort(key=lambda r: (-r[2], -r[1], r[0]))
+    return results[:top]
+
+
+if __name__ == "__main__":
+    changed = sync_index()
+    print(f"Indexed {changed} changed applications into {INDEX_PATH}", file=sys.stderr)
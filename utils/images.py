@@ -0,0 +1,138 @@
+from pathlib import Path
+from typing import BinaryIO, Union
+
+from PIL import Image, ImageOps
+
+# Screen thumbnail bounding box (pixels)
+THUMB_SIZE = (640, 640)
+
+# Box the application image gets in the Word summary (see create_word_doc)
+PRINT_BOX_MM = (140, 100)
+PRINT_DPI = 96
+
+# Photos compress far better as JPEG, line drawings (few colors) as PNG
+DERIVATIVE_SUFFIXES = {"JPEG": ".jpg", "PNG": ".png"}
+
+
+def mm_to_px(mm: float, dpi: int = PRINT_DPI) -> int:
+    return int((mm / 25.4) * dpi)
+
+
+def px_to_mm(px: int, dpi: int = PRINT_DPI) -> float:
+    return (px / dpi) * 25.4
+
+
+def derivative_path(directory: Path, filename: str, kind: str) -> Path:
+    """Returns the existing derivative of the given kind, whatever its format."""
+    for suffix in DERIVATIVE_SUFFIXES.values():
+        path = directory / f"appl_image_{filename}_{kind}{suffix}"
+        if path.is_file():
+            return path
+    return directory / f"appl_image_{filename}_{kind}.png"
+
+
+def image_paths(directory: Path, filename: str) -> dict:
+    """Returns the paths of the normalized image and its derivatives."""
+    return {
+        "original": directory / f"appl_image_{filename}.png",
+        "thumb": derivative_path(directory, filename, "thumb"),
+        "print": derivative_path(directory, filename, "print"),
+    }
+
+
+def fit_to_box(size: tuple[int, int], box: tuple[int, int]) -> tuple[int, int]:
+    """Scales size down to fit into box while keeping the aspect ratio (never upscales)."""
+    width, height = size
+    max_width, max_height = box
+    if width <= max_width and height <= max_height:
+        return width, height
+
+    aspect_ratio = width / height
+    if width / max_width > height / max_height:
+        return max_width, max(1, int(max_width / aspect_ratio))
+    return max(1, int(max_height * aspect_ratio)), max_height
+
+
+def normalize_image(img: Image.Image) -> Image.Image:
+    """Applies the EXIF orientation and converts to a mode PNG can store losslessly."""
+    img = ImageOps.exif_transpose(img)
+    has_alpha = img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info)
+    return img.convert("RGBA" if has_alpha else "RGB")
+
+
+def derivative_format(img: Image.Image) -> str:
+    return "PNG" if img.getcolors(maxcolors=256) is not None else "JPEG"
+
+
+def save_derivative(img: Image.Image, path: Path) -> Path:
+    """Saves a derivative in the format that suits its content and removes
+    any variant of it stored in the other format."""
+    image_format = derivative_format(img)
+    target = path.with_suffix(DERIVATIVE_SUFFIXES[image_format])
+
+    if image_format == "JPEG":
+        if img.mode == "RGBA":
+            # Flatten transparency onto the white page background
+            background = Image.new("RGB", img.size, "white")
+            background.paste(img, mask=img.getchannel("A"))
+            img = background
+        img.save(target, format="JPEG", quality=85, optimize=True)
+    else:
+        img.save(target, format="PNG", optimize=True)
+
+    for suffix in DERIVATIVE_SUFFIXES.values():
+        other = path.with_suffix(suffix)
+        if other != target and other.is_file():
+            other.unlink()
+    return target
+
+
+def write_derivatives(img: Image.Image, paths: dict) -> dict:
+    thumb = img.copy()
+    thumb.thumbnail(THUMB_SIZE, Image.Resampling.LANCZOS)
+    paths["thumb"] = save_derivative(thumb, paths["thumb"])
+
+    print_box = (mm_to_px(PRINT_BOX_MM[0]), mm_to_px(PRINT_BOX_MM[1]))
+    print_size = fit_to_box(img.size, print_box)
+    printed = img if print_size == img.size else img.resize(print_size, Image.Resampling.LANCZOS)
+    paths["print"] = save_derivative(printed, paths["print"])
+    return paths
+
+
+def process_uploaded_image(source: Union[BinaryIO, Path], directory: Path, filename: str) -> dict:
+    """Decodes an uploaded image once, stores it as a real PNG and writes the
+    screen thumbnail and the print-sized version used by the Word summary."""
+    paths = image_paths(directory, filename)
+
+    with Image.open(source) as img:
+        img = normalize_image(img)
+
+    img.save(paths["original"], format="PNG", optimize=True)
+    return write_derivatives(img, paths)
+
+
+def ensure_derivatives(directory: Path, filename: str) -> dict | None:
+    """Returns the image paths, (re)building derivatives that are missing or older
+    than the stored image. Returns None if no application image exists."""
+    paths = image_paths(directory, filename)
+    original = paths["original"]
+    if not original.is_file():
+        return None
+
+    original_mtime = original.stat().st_mtime
+    stale = any(
+        not paths[key].is_file() or paths[key].stat().st_mtime < original_mtime
+        for key in ("thumb", "print")
+    )
+    if stale:
+        # Images stored before the pipeline existed may be JPEGs with a .png name
+        with Image.open(original) as img:
+            paths = write_derivatives(normalize_image(img), paths)
+    return paths
+
+
+def print_size_mm(print_path: Path) -> tuple[float, float]:
+    """Size (width, height) in mm at which the print derivative fills the docx box."""
+    with Image.open(print_path) as img:
+        width, height = img.size
+    return px_to_mm(width), px_to_mm(height)
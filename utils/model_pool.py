@@ -0,0 +1,123 @@
+"""Language-aware pool of spaCy pipelines.
+
+Claims are written in English, German or French. The language of a claim is
+guessed from its most frequent function words, and the matching pipeline is
+loaded on first use from the locally installed packages; languages without an
+installed pipeline fall back to English. The pool is process-wide, so all
+sessions (or the NLP worker process) share the loaded pipelines. When more
+pipelines are loaded than the budget allows, the least recently used ones are
+unloaded. The budget is a number of pipelines, as the size of a pipeline on
+disk says little about the memory it takes once loaded.
+
+    PATENT_NLP_MAX_MODELS=2                 # pipelines kept loaded at once
+    python -m utils.model_pool test_set.txt # language and pipeline of each claim
+    python -m utils.model_pool --check      # shows the unloading with blank pipelines
+"""
+import gc
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import spacy
+
+from utils.vocabulary import DEFAULT_LANGUAGE, detect_language
+
+LANGUAGE_MODELS = {
+    "en": "en_core_web_sm",
+    "de": "de_core_news_sm",
+    "fr": "fr_core_news_sm",
+}
+MAX_MODELS = int(os.environ.get("PATENT_NLP_MAX_MODELS", "2"))
+
+
+class ModelPool:
+    """Loaded pipelines by model name, least recently used first."""
+
+    def __init__(self, max_models: int = MAX_MODELS, load=spacy.load):
+        self.max_models = max(1, max_models)
+        self._load = load                           # model name -> pipeline
+        self._models = OrderedDict()                # model name -> nlp
+        self._lock = threading.Lock()
+        self._load_locks = {}                       # model name -> lock held while loading
+
+    def model_for(self, language: str) -> str:
+        """Model name of a language; the English model if that language is not installed."""
+        model_name = LANGUAGE_MODELS.get(language, LANGUAGE_MODELS[DEFAULT_LANGUAGE])
+        if language != DEFAULT_LANGUAGE and not spacy.util.is_package(model_name):
+            return LANGUAGE_MODELS[DEFAULT_LANGUAGE]
+        return model_name
+
+    def loaded(self) -> list[str]:
+        with self._lock:
+            return list(self._models)
+
+    def get(self, model_name: str):
+        """The pipeline of model_name, loaded on first use."""
+        with self._lock:
+            if model_name in self._models:
+                self._models.move_to_end(model_name)
+                return self._models[model_name]
+            load_lock = self._load_locks.setdefault(model_name, threading.Lock())
+
+        with load_lock:                             # Sessions asking for the same model wait for one load
+            with self._lock:
+                if model_name in self._models:
+                    self._models.move_to_end(model_name)
+                    return self._models[model_name]
+            nlp = self._load(model_name)
+            with self._lock:
+                self._models[model_name] = nlp
+                self._unload()
+            return nlp
+
+    def _unload(self) -> None:
+        """Drops least recently used pipelines until the pool fits the budget."""
+        if len(self._models) > self.max_models:
+            while len(self._models) > self.max_models:
+                self._models.popitem(last=False)
+            gc.collect()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ModelPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ModelPool()
+        return _pool
+
+
+def check() -> int:
+    """Uses blank pipelines in a pool of two: en, de, en again, then fr must unload de."""
+    pool = ModelPool(max_models=2, load=lambda model_name: spacy.blank(model_name[:2]))
+    for language in ("en", "de", "en", "fr"):
+        pool.get(LANGUAGE_MODELS[language])
+        print(f"{language}: loaded {', '.join(pool.loaded())}")
+    expected = [LANGUAGE_MODELS["en"], LANGUAGE_MODELS["fr"]]
+    print("ok" if pool.loaded() == expected else f"expected {', '.join(expected)}")
+    return 0 if pool.loaded() == expected else 1
+
+
+def main(argv: list[str] | None = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv == ["--check"]:
+        return check()
+    if len(argv) != 1:
+        print("usage: python -m utils.model_pool CLAIMS_FILE | --check", file=sys.stderr)
+        return 2
+    from utils.claims import split_claim_lines
+    with open(argv[0], "r", encoding="utf-8") as f:
+        claims = split_claim_lines(f.read())
+    pool = get_pool()
+    for number, claim in enumerate(claims, start=1):
+        language = detect_language(claim)
+        print(f"{number:>4}  {language}  {pool.model_for(language)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
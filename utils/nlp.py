@@ -0,0 +1,152 @@
+"""Noun-phrase extraction engines.
+
+"spacy" uses the noun chunks of the spaCy pipeline of each claim's language
+(en_core_web_sm for English, see utils.model_pool). "rules" is a model-free engine
+for the regular "a/an/the/said ... comprising/wherein" grammar of claims:
+a phrase starts at a determiner and runs until a function word, a verb form or
+punctuation. Compare both with `python -m utils.engine_accuracy`.
+"""
+import re
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from functools import lru_cache
+
+from utils.model_pool import LANGUAGE_MODELS, get_pool
+from utils.vocabulary import DEFAULT_LANGUAGE, detect_language
+
+MODEL_NAME = LANGUAGE_MODELS[DEFAULT_LANGUAGE]
+DEFAULT_ENGINE = "spacy"
+
+
+def load_model(model_name: str = MODEL_NAME):
+    return get_pool().get(model_name)
+
+
+# Elided French articles, a token of their own in the French pipelines ("l'élément")
+ELIDED = {"l'", "L'", "l’", "L’"}
+
+
+def chunks_from_doc(doc) -> list[str]:
+    """Noun chunks of more than one token made of words, numbers, brackets and commas."""
+    return [
+        chunk.text for chunk in doc.noun_chunks
+        if len(chunk) > 1 and all(token.is_alpha or token.is_digit or token.text in {'(', ')', ','} or token.text in ELIDED
+                                  for token in chunk)
+    ]
+
+
+def dedupe_chunks(chunks: list[str]) -> list[str]:
+    """Removes exact duplicates while maintaining order of appearance.
+
+    Variants such as "The apparatus" and "the apparatus" are kept: the claim is split at
+    each of them as written. They become one feature in the vocabulary and the graph."""
+    return list(OrderedDict.fromkeys(chunks))
+
+
+def pipe_chunks(texts: list[str], model_name: str | None = None) -> list[list[str]]:
+    """Runs the texts through one nlp.pipe batch per language and returns the raw chunks of each.
+
+    With model_name, all texts go through that model instead."""
+    pool = get_pool()
+    groups = OrderedDict()                          # model name -> indexes of its texts
+    for i, text in enumerate(texts):
+        groups.setdefault(model_name or pool.model_for(detect_language(text)), []).append(i)
+
+    results = [None] * len(texts)
+    for name, indexes in groups.items():
+        nlp = pool.get(name)
+        docs = nlp.pipe([texts[i] for i in indexes], batch_size=max(1, len(indexes)))
+        for i, doc in zip(indexes, docs):
+            results[i] = chunks_from_doc(doc)
+    return results
+
+
+class ExtractionEngine(ABC):
+    """Returns the raw noun phrases of each text, in order of appearance."""
+
+    name = ""
+
+    @abstractmethod
+    def chunks(self, texts: list[str]) -> list[list[str]]:
+        ...
+
+
+class SpacyEngine(ExtractionEngine):
+    name = "spacy"
+
+    def chunks(self, texts: list[str]) -> list[list[str]]:
+        return pipe_chunks(texts)
+
+
+# Words that open a noun phrase
+DETERMINERS = {"a", "an", "the", "said", "any", "each", "every", "another", "its", "their", "two", "three", "several"}
+
+# Words that end a noun phrase
+STOP_WORDS = {
+    # prepositions and conjunctions
+    "of", "for", "to", "in", "into", "on", "onto", "at", "by", "with", "without", "from", "between", "through",
+    "via", "over", "under", "about", "against", "along", "around", "across", "after", "before", "during",
+    "within", "upon", "towards", "toward", "than", "as", "and", "or", "nor", "but", "if", "when", "while",
+    "until", "so", "such", "whereby", "wherein", "whereas", "which", "that", "who", "whose", "where",
+    # auxiliaries and frequent claim verbs
+    "is", "are", "was", "were", "be", "been", "being", "has", "have", "had", "having", "can", "may", "might",
+    "will", "would", "shall", "should", "must", "does", "do", "not", "comprises", "comprise", "comprising",
+    "includes", "include", "including", "contains", "contain", "containing", "consists", "consisting",
+    "provides", "provide", "provided", "configured", "adapted", "arranged", "designed", "connected",
+    "coupled", "mounted", "disposed", "located", "positioned", "operable", "capable", "able",
+    "according", "respectively", "further", "also", "thereof", "therein", "thereby", "it", "they",
+    # adverbs frequent in claims ("assembly" or "supply" also end in -ly, so no suffix rule)
+    "preferably", "optionally", "gradually", "directly", "indirectly", "independently", "only",
+}
+
+TOKEN = re.compile(r"[A-Za-z]+(?:-[A-Za-z]+)*|\d+|[^\sA-Za-z\d]")
+
+
+class RuleEngine(ExtractionEngine):
+    """Determiner-led noun phrases; no model load, pure string rules."""
+
+    name = "rules"
+
+    @staticmethod
+    def _is_word(token: str) -> bool:
+        return token[0].isalpha() or token.isdigit()
+
+    def _phrases(self, text: str) -> list[str]:
+        tokens = TOKEN.findall(text)
+        phrases = []
+        i = 0
+        while i < len(tokens):
+            if tokens[i].lower() not in DETERMINERS:
+                i += 1
+                continue
+
+            j = i + 1
+            while j < len(tokens) and self._is_word(tokens[j]):
+                word = tokens[j].lower()
+                if word in STOP_WORDS or word in DETERMINERS:
+                    break
+                # Participles belong to the phrase only in front of another word ("a holding device")
+                if word.endswith(("ed", "ing")):
+                    following = tokens[j + 1].lower() if j + 1 < len(tokens) else ""
+                    if not following or not self._is_word(following) or following in STOP_WORDS:
+                        break
+                j += 1
+
+            if j - i > 1:
+                phrases.append(" ".join(tokens[i:j]))
+            i = max(j, i + 1)
+        return phrases
+
+    def chunks(self, texts: list[str]) -> list[list[str]]:
+        return [self._phrases(text) for text in texts]
+
+
+ENGINES = {engine.name: engine for engine in (SpacyEngine, RuleEngine)}
+
+
+@lru_cache(maxsize=None)
+def get_engine(name: str = DEFAULT_ENGINE) -> ExtractionEngine:
+    try:
+        return ENGINES[name]()
+    except KeyError:
+        raise ValueError(f"Unknown extraction engine '{name}', choose from {sorted(ENGINES)}") from None
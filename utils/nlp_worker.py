@@ -0,0 +1,192 @@
+"""Shared spaCy worker process with cross-session micro-batching.
+
+Streamlit runs every session in its own script thread. Instead of each thread
+calling the model with a single claim, requests from all sessions are queued,
+gathered for a few milliseconds and sent to one worker process as a single
+nlp.pipe batch. Set PATENT_NLP_WORKER=0 to extract in the calling thread instead.
+Engines without a model (e.g. "rules") always run in the calling thread.
+"""
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from itertools import islice
+from typing import Iterable, Iterator
+
+from utils.nlp import DEFAULT_ENGINE, dedupe_chunks, get_engine, pipe_chunks
+
+BATCH_WINDOW = 0.005                                # Seconds to wait for more claims
+MAX_BATCH = 64
+RESULT_TIMEOUT = 120                                # Includes the model load of a fresh worker
+
+USE_WORKER = os.environ.get("PATENT_NLP_WORKER", "1") != "0"
+
+
+def _serve(requests: mp.Queue, responses: mp.Queue) -> None:
+    """Worker process loop: (batch_id, texts) in, (batch_id, chunks or error) out.
+
+    The worker holds the model pool, so the pipelines of all languages are loaded once, here."""
+    while True:
+        message = requests.get()
+        if message is None:
+            break
+        batch_id, texts = message
+        try:
+            responses.put((batch_id, pipe_chunks(texts), None))
+        except Exception as e:  # Report to the waiting sessions instead of dying
+            responses.put((batch_id, None, repr(e)))
+
+
+class ExtractionWorker:
+    def __init__(self):
+        ctx = mp.get_context("spawn")               # Never fork the Streamlit server's threads
+        self._requests = ctx.Queue()
+        self._responses = ctx.Queue()
+        self._process = ctx.Process(
+            target=_serve, args=(self._requests, self._responses), daemon=True
+        )
+        self._process.start()
+
+        self._pending = queue.Queue()               # (text, Future) from all sessions
+        self._in_flight = {}                        # batch_id -> list of Futures
+        self._lock = threading.Lock()
+        self._dead = threading.Event()              # Set once the process exited; no batch is sent after
+        self._batch_ids = itertools.count()
+        threading.Thread(target=self._dispatch, daemon=True).start()
+        threading.Thread(target=self._receive, daemon=True).start()
+
+    def is_alive(self) -> bool:
+        return not self._dead.is_set() and self._process.is_alive()
+
+    def submit(self, text: str) -> Future:
+        future = Future()
+        if self._dead.is_set():
+            future.set_exception(RuntimeError("NLP worker failed: worker process exited"))
+            return future
+        self._pending.put((text, future))
+        if self._dead.is_set():                     # Died while queueing: nobody dispatches any more
+            self._fail_pending("worker process exited")
+        return future
+
+    def _dispatch(self) -> None:
+        while not self._dead.is_set():
+            try:
+                batch = [self._pending.get(timeout=1)]
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + BATCH_WINDOW
+            while len(batch) < MAX_BATCH:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            batch_id = next(self._batch_ids)
+            with self._lock:
+                if self._dead.is_set():
+                    _fail([future for _, future in batch], "worker process exited")
+                    break
+                self._in_flight[batch_id] = [future for _, future in batch]
+            self._requests.put((batch_id, [text for text, _ in batch]))
+        self._fail_pending("worker process exited")
+
+    def _receive(self) -> None:
+        while True:
+            try:
+                batch_id, results, error = self._responses.get(timeout=1)
+            except queue.Empty:
+                if not self._process.is_alive():
+                    self._die("worker process exited")
+                    return
+                continue
+            with self._lock:
+                futures = self._in_flight.pop(batch_id, [])
+            for i, future in enumerate(futures):
+                if error is None:
+                    future.set_result(results[i])
+                else:
+                    future.set_exception(RuntimeError(f"NLP worker failed: {error}"))
+
+    def _die(self, reason: str) -> None:
+        """Fails every request that was sent or is still queued."""
+        with self._lock:
+            self._dead.set()
+            batches, self._in_flight = list(self._in_flight.values()), {}
+        for futures in batches:
+            _fail(futures, reason)
+        self._fail_pending(reason)
+
+    def _fail_pending(self, reason: str) -> None:
+        futures = []
+        while True:
+            try:
+                futures.append(self._pending.get_nowait()[1])
+            except queue.Empty:
+                break
+        _fail(futures, reason)
+
+
+def _fail(futures: list[Future], reason: str) -> None:
+    for future in futures:
+        future.set_exception(RuntimeError(f"NLP worker failed: {reason}"))
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_worker() -> ExtractionWorker | None:
+    """The process-wide worker, (re)started on demand; None if workers are disabled."""
+    global _worker
+    if not USE_WORKER:
+        return None
+    with _worker_lock:
+        if _worker is not None and not _worker.is_alive():
+            _worker = None                          # Its queued requests were failed; start afresh
+        if _worker is None:
+            _worker = ExtractionWorker()
+        return _worker
+
+
+def _batches(items: Iterable[str], size: int) -> Iterator[list[str]]:
+    items = iter(items)
+    while batch := list(islice(items, size)):
+        yield batch
+
+
+def iter_extract(claims: Iterable[str], engine: str = DEFAULT_ENGINE, batch_size: int = 8) -> Iterator[list[list[str]]]:
+    """Noun chunks of the claims batch by batch, in order, each batch as soon as it is done.
+
+    With the worker the next batch is already queued while the current one is awaited."""
+    worker = get_worker() if engine == "spacy" else None
+    if worker is None:
+        extraction_engine = get_engine(engine)
+        for batch in _batches(claims, batch_size):
+            yield [dedupe_chunks(chunks) for chunks in extraction_engine.chunks(batch)]
+        return
+
+    pending = None
+    for batch in _batches(claims, batch_size):
+        futures = [worker.submit(claim) for claim in batch]
+        if pending is not None:
+            yield [dedupe_chunks(future.result(timeout=RESULT_TIMEOUT)) for future in pending]
+        pending = futures
+    if pending is not None:
+        yield [dedupe_chunks(future.result(timeout=RESULT_TIMEOUT)) for future in pending]
+
+
+def extract_many(claims: list[str], engine: str = DEFAULT_ENGINE) -> list[list[str]]:
+    """Noun chunks of every claim, deduplicated per claim; spaCy requests are
+    batched with other sessions' claims."""
+    worker = get_worker() if engine == "spacy" else None
+    if worker is None:
+        return [dedupe_chunks(chunks) for chunks in get_engine(engine).chunks(claims)]
+
+    futures = [worker.submit(claim) for claim in claims]
+    return [dedupe_chunks(future.result(timeout=RESULT_TIMEOUT)) for future in futures]
@@ -0,0 +1,240 @@
+"""Background precomputation of the pages that follow the Extract page.
+
+When claims or a network are saved, a job builds the claim graph, the markers
+of the saved network and the Word summary in a worker pool and stores them as provisional results under
+data/<NAME>/provisional/. Every result records the content hash of the input
+it was computed from, and a page only uses it if that hash matches its
+current input; otherwise it computes the section itself as before. A newer
+save of the same application supersedes its pending and running jobs.
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+
+from utils.features import concatenated_frame
+from utils.graph import create_graph, graph_from_network, network_section
+from utils.images import image_paths
+from utils.reachability import MAX_LISTED_BRANCHES, ReachabilityIndex, generate_markers_dict
+from utils.report import LABELS, build_report, summary_docx_path
+from utils.revisions import content_hash
+from utils.storage import app_directory, load_summary
+from utils.vocabulary import load_vocabulary
+
+MAX_WORKERS = 2
+STEPS = ("Network", "Markers", "docx")
+STEP_WAIT = 2.0                                     # Seconds a page waits for a step before computing it itself
+
+log = logging.getLogger(__name__)
+
+
+def provisional_dir(filename: str) -> Path:
+    return app_directory(filename) / "provisional"
+
+
+def _result_path(filename: str, key: str) -> Path:
+    return provisional_dir(filename) / f"{key.lower()}.json"
+
+
+def _stored_source(filename: str, key: str) -> str | None:
+    try:
+        with open(_result_path(filename, key), "r", encoding="utf-8") as f:
+            return json.load(f).get("source")
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _store(filename: str, key: str, source: str, value) -> None:
+    path = _result_path(filename, key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"source": source, "value": value}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def provisional_section(filename: str, key: str, source_value):
+    """The provisional "Network" or "Markers" computed from source_value, or None."""
+    try:
+        with open(_result_path(filename, key), "r", encoding="utf-8") as f:
+            stored = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    return stored["value"] if stored.get("source") == content_hash(source_value) else None
+
+
+def markers_source(network: dict, max_nodes: int, max_branches: int) -> dict:
+    """What the markers are computed from: the network and the branch limits."""
+    return {"network": network, "limits": [max_nodes, max_branches]}
+
+
+def docx_source(filename: str) -> str:
+    """Hash of everything a Word summary is made of: the fields, the date and the image."""
+    data = load_summary(filename, derived=False)
+    image = image_paths(app_directory(filename), filename)["original"]
+    stamp = [image.stat().st_mtime_ns, image.stat().st_size] if image.is_file() else None
+    return content_hash({
+        "fields": {label: str(data.get(label, "")) for label in LABELS},
+        "date": f"{date.today()}",
+        "image": stamp,
+    })
+
+
+def _docx_path(filename: str) -> Path:
+    return provisional_dir(filename) / f"Summary_{filename}.docx"
+
+
+def use_provisional_docx(filename: str) -> Path | None:
+    """Puts the prepared Word summary in place if it is up to date; None if it is not."""
+    if _stored_source(filename, "docx") != docx_source(filename) or not _docx_path(filename).is_file():
+        return None
+    target = summary_docx_path(filename)
+    shutil.copyfile(_docx_path(filename), target)
+    return target
+
+
+# Reachability indexes of the current networks, shared by all sessions
+_indexes = {}                                       # filename -> (network hash, index)
+_indexes_lock = threading.Lock()
+
+
+def reachability_index(filename: str, network: dict) -> ReachabilityIndex:
+    """Index of a network, built once per version of the network."""
+    source = content_hash(network)
+    with _indexes_lock:
+        cached = _indexes.get(filename)
+    if cached is not None and cached[0] == source:
+        return cached[1]
+    index = ReachabilityIndex(graph_from_network(network))
+    with _indexes_lock:
+        _indexes[filename] = (source, index)
+    return index
+
+
+class Superseded(Exception):
+    pass
+
+
+class PrecomputeScheduler:
+    """Runs the downstream steps of saved applications in a worker pool,
+    one job per application at a time, newest save first to win."""
+
+    def __init__(self, max_workers: int = MAX_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="precompute")
+        self._lock = threading.Lock()
+        self._generations = {}                      # filename -> number of the latest job
+        self._jobs = {}                             # filename -> future of the latest job
+        self._steps = {}                            # filename -> {step: event set when the step is over}
+        self._app_locks = {}
+        self.errors = {}                            # filename -> last job error
+
+    def schedule(self, filename: str) -> Future:
+        """Starts the downstream steps of filename, superseding its earlier jobs."""
+        with self._lock:
+            generation = self._generations.get(filename, 0) + 1
+            self._generations[filename] = generation
+            previous = self._jobs.get(filename)
+            if previous is not None:
+                previous.cancel()                   # Not started yet: never runs
+            for event in self._steps.get(filename, {}).values():
+                event.set()                         # Nobody waits for a superseded job
+            steps = {step: threading.Event() for step in STEPS}
+            self._steps[filename] = steps
+            future = self._executor.submit(self._run, filename, generation, steps)
+            self._jobs[filename] = future
+        return future
+
+    def pending(self, filename: str, step: str | None = None) -> bool:
+        """Whether the latest job of filename (or one of its steps) is still to finish."""
+        with self._lock:
+            future = self._jobs.get(filename)
+            event = self._steps.get(filename, {}).get(step)
+        if step is not None:
+            return event is not None and not event.is_set()
+        return future is not None and not future.done()
+
+    def wait(self, filename: str, step: str, timeout: float = STEP_WAIT) -> bool:
+        """Waits for one step of the latest job of filename; False if it is still running."""
+        with self._lock:
+            event = self._steps.get(filename, {}).get(step)
+        return event is None or event.wait(timeout)
+
+    def error(self, filename: str) -> str | None:
+        """Error of the last finished job of filename, if it failed."""
+        return self.errors.get(filename)
+
+    def _check(self, filename: str, generation: int) -> None:
+        with self._lock:
+            if self._generations.get(filename) != generation:
+                raise Superseded()
+
+    def _run(self, filename: str, generation: int, steps: dict) -> None:
+        with self._lock:
+            app_lock = self._app_locks.setdefault(filename, threading.Lock())
+        with app_lock:
+            try:
+                self._check(filename, generation)
+                network, saved = self._network(filename)
+                steps["Network"].set()
+                self._check(filename, generation)
+                if network and saved:               # The Markers page only reads the saved network
+                    self._markers(filename, network)
+                steps["Markers"].set()
+                self._check(filename, generation)
+                self._docx(filename)
+                self.errors.pop(filename, None)
+            except Superseded:
+                pass
+            except Exception as e:
+                log.exception("Precomputation of %s failed", filename)
+                self.errors[filename] = repr(e)
+            finally:
+                for event in steps.values():        # Waiting pages compute the rest themselves
+                    event.set()
+
+    def _network(self, filename: str) -> tuple[dict | None, bool]:
+        """The saved network, else the provisional one built from the Concatenated DataFrame;
+        and whether it is the saved one."""
+        data = load_summary(filename)
+        if data.get("Network"):
+            return data["Network"], True
+        concatenated = data.get("Concatenated DataFrame")
+        if not concatenated:
+            return None, False
+        network = provisional_section(filename, "Network", concatenated)
+        if network is None:
+            # The vocabulary is not saved here; the Network page saves it when it uses the graph
+            G = create_graph(concatenated_frame(concatenated), load_vocabulary(filename))
+            network = network_section(G)
+            _store(filename, "Network", content_hash(concatenated), network)
+        return network, False
+
+    def _markers(self, filename: str, network: dict) -> None:
+        """Markers of the saved network with the default limits of the Markers page."""
+        index = reachability_index(filename, network)
+        max_nodes = max(2, len(index.nodes))
+        source = content_hash(markers_source(network, max_nodes, MAX_LISTED_BRANCHES))
+        if _stored_source(filename, "Markers") != source:
+            _store(filename, "Markers", source, generate_markers_dict(network, index, max_nodes, MAX_LISTED_BRANCHES))
+
+    def _docx(self, filename: str) -> None:
+        source = docx_source(filename)
+        if _stored_source(filename, "docx") != source or not _docx_path(filename).is_file():
+            build_report([filename], _docx_path(filename))
+            _store(filename, "docx", source, None)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> PrecomputeScheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = PrecomputeScheduler()
+        return _scheduler
@@ -0,0 +1,180 @@
+"""Local prior-art passages and a BM25 index to locate claim features in them.
+
+Plain text of each cited document is stored as data/<NAME>/prior_art/D<n>.txt.
+Pages are separated by form feeds (as produced by pdftotext); paragraphs by
+blank lines or patent paragraph numbers like [0012].
+"""
+import json
+import math
+import re
+from collections import Counter, defaultdict
+from functools import lru_cache
+from pathlib import Path
+
+from utils.storage import app_directory
+
+INDEX_NAME = "index.json"
+INDEX_VERSION = 1
+
+# BM25 parameters
+K1 = 1.5
+B = 0.75
+
+TOKEN = re.compile(r"[a-z0-9]+")
+PARAGRAPH_NUMBER = re.compile(r"^\s*\[(\d{3,5})\]\s*")
+DOCUMENT_NAME = re.compile(r"D(\d+)")
+STOPWORDS = {
+    "a", "an", "the", "said", "of", "to", "in", "on", "for", "and", "or", "at", "by",
+    "with", "is", "are", "be", "which", "that", "wherein", "least", "one", "first", "second",
+}
+
+
+def prior_art_directory(filename: str) -> Path:
+    return app_directory(filename) / "prior_art"
+
+
+def tokenize(text: str) -> list[str]:
+    return [token for token in TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def split_passages(text: str) -> list[tuple[str, str]]:
+    """Splits a document into (reference, passage) pairs.
+
+    Numbered paragraphs are referenced as '[0012]', others by page and paragraph."""
+    pages = text.split("\f")
+    multi_page = len(pages) > 1
+    passages = []
+
+    for page_nr, page in enumerate(pages, start=1):
+        paragraphs = [p.strip() for p in re.split(r"\n\s*\n", page) if p.strip()]
+        for par_nr, paragraph in enumerate(paragraphs, start=1):
+            numbered = PARAGRAPH_NUMBER.match(paragraph)
+            if numbered:
+                ref = f"[{numbered.group(1)}]"
+            elif multi_page:
+                ref = f"page {page_nr}, par. {par_nr}"
+            else:
+                ref = f"par. {par_nr}"
+            passages.append((ref, re.sub(r"\s+", " ", paragraph)))
+    return passages
+
+
+def document_paths(directory: Path) -> list[Path]:
+    """The D<n>.txt files of a directory, by number; other files are ignored."""
+    numbered = []
+    for p in directory.glob("D*.txt"):
+        match = DOCUMENT_NAME.fullmatch(p.stem)
+        if match:
+            numbered.append((int(match.group(1)), p))
+    return [p for _, p in sorted(numbered)]
+
+
+def build_index(filename: str) -> dict:
+    """Indexes all D<n>.txt documents of an application and stores the index on disk."""
+    directory = prior_art_directory(filename)
+    passages = []
+    postings = defaultdict(list)
+    documents = {}
+
+    for doc_path in document_paths(directory):
+        doc_id = doc_path.stem
+        documents[doc_id] = doc_path.stat().st_mtime_ns
+        text = doc_path.read_text(encoding="utf-8", errors="replace")
+        for ref, passage in split_passages(text):
+            tokens = tokenize(passage)
+            if not tokens:
+                continue
+            passage_id = len(passages)
+            passages.append([doc_id, ref, len(tokens)])
+            for term, tf in Counter(tokens).items():
+                postings[term].append([passage_id, tf])
+
+    index = {
+        "version": INDEX_VERSION,
+        "documents": documents,
+        "passages": passages,
+        "avgdl": sum(p[2] for p in passages) / len(passages) if passages else 0.0,
+        "postings": postings,
+    }
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / INDEX_NAME, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False)
+    return index
+
+
+def ingest_document(filename: str, doc_id: str, text: str) -> dict:
+    """Stores the text of a cited document (e.g. 'D1') and rebuilds the index."""
+    directory = prior_art_directory(filename)
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / f"{doc_id}.txt").write_text(text, encoding="utf-8")
+    return build_index(filename)
+
+
+def list_documents(filename: str) -> list[str]:
+    directory = prior_art_directory(filename)
+    if not directory.is_dir():
+        return []
+    return [p.stem for p in document_paths(directory)]
+
+
+@lru_cache(maxsize=8)
+def _load_index(index_path: str, mtime_ns: int) -> dict:
+    with open(index_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_index(filename: str) -> dict | None:
+    """Loads the stored index, rebuilding it if a document changed since it was built."""
+    directory = prior_art_directory(filename)
+    index_path = directory / INDEX_NAME
+    if not index_path.is_file():
+        return build_index(filename) if list_documents(filename) else None
+
+    index = _load_index(str(index_path), index_path.stat().st_mtime_ns)
+    current = {p.stem: p.stat().st_mtime_ns for p in document_paths(directory)}
+    if index.get("version") != INDEX_VERSION or index.get("documents") != current:
+        return build_index(filename)
+    return index
+
+
+def best_passages(index: dict, queries: list[str]) -> dict:
+    """Scores all queries against the index in one batch.
+
+    Returns {(doc_id, query): reference} with the best passage per document."""
+    passages = index["passages"]
+    postings = index["postings"]
+    n = len(passages)
+    avgdl = index["avgdl"] or 1.0
+
+    # Term weights are computed once for the whole batch
+    query_terms = {query: set(tokenize(query)) for query in queries}
+    all_terms = set().union(*query_terms.values()) if query_terms else set()
+    idf = {}
+    for term in all_terms:
+        df = len(postings.get(term, ()))
+        idf[term] = math.log(1 + (n - df + 0.5) / (df + 0.5)) if df else 0.0
+
+    locations = {}
+    for query, terms in query_terms.items():
+        scores = defaultdict(float)
+        for term in terms:
+            for passage_id, tf in postings.get(term, ()):
+                length = passages[passage_id][2]
+                scores[passage_id] += idf[term] * tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / avgdl))
+
+        best = {}
+        for passage_id, score in scores.items():
+            doc_id = passages[passage_id][0]
+            if score > best.get(doc_id, (0.0, None))[0]:
+                best[doc_id] = (score, passage_id)
+        for doc_id, (_, passage_id) in best.items():
+            locations[(doc_id, query)] = passages[passage_id][1]
+    return locations
+
+
+def locate_features(filename: str, features: list[str]) -> dict:
+    """Citation locations {(doc_id, feature): reference} for the given features."""
+    index = load_index(filename)
+    if not index or not index["passages"]:
+        return {}
+    return best_passages(index, sorted({f for f in features if f and f.strip()}))
@@ -0,0 +1,149 @@
+"""Reachability index of a claim graph for the Markers page.
+
+The transitive closure is kept as one Python int per node whose bits mark the
+reachable nodes, computed over the strongly connected components in reverse
+topological order. Co-occurrence queries are then bit operations, branch
+counts come from a dynamic program over the graph, and branches are only
+enumerated on demand, up to the requested length and number.
+"""
+from functools import reduce
+from itertools import islice
+from operator import or_
+from typing import Iterator
+
+import networkx as nx
+
+from utils.graph import int_adjacency
+
+MAX_LISTED_BRANCHES = 200   # Default number of branches listed per head feature
+
+
+def _closure(G: nx.DiGraph, index: dict) -> list[int]:
+    """Bitset of the nodes reachable from each node, the node itself included."""
+    condensed = nx.condensation(G)
+    component_of = condensed.graph["mapping"]
+    component_bits = {}
+    for component in reversed(list(nx.topological_sort(condensed))):
+        bits = reduce(or_, (1 << index[member] for member in condensed.nodes[component]["members"]), 0)
+        for successor in condensed.successors(component):
+            bits |= component_bits[successor]
+        component_bits[component] = bits
+    closure = [0] * len(index)
+    for node, i in index.items():
+        closure[i] = component_bits[component_of[node]]
+    return closure
+
+
+class ReachabilityIndex:
+    """Built once per saved network; all node arguments are node names."""
+
+    def __init__(self, G: nx.DiGraph):
+        self.nodes, self.index, self.adjacency = int_adjacency(G)
+        self.is_dag = nx.is_directed_acyclic_graph(G)
+        self.heads = [node for node in G.nodes if G.in_degree(node) == 0]
+        self.reach = _closure(G, self.index)
+        self.reached_by = _closure(G.reverse(copy=False), self.index)
+        self._path_counts = {}
+        self._branch_counts = {}
+
+    def names(self, bits: int) -> list[str]:
+        """Node names of a bitset, in node order."""
+        result = []
+        while bits:
+            low = bits & -bits
+            result.append(self.nodes[low.bit_length() - 1])
+            bits ^= low
+        return result
+
+    def descendants(self, node: str) -> list[str]:
+        i = self.index[node]
+        return self.names(self.reach[i] & ~(1 << i))
+
+    def ancestors(self, node: str) -> list[str]:
+        i = self.index[node]
+        return self.names(self.reached_by[i] & ~(1 << i))
+
+    def co_occurring(self, node: str) -> list[str]:
+        """Features that share a branch with node: its ancestors and descendants.
+
+        Exact for acyclic graphs; with cycles some pairs may not share a simple path."""
+        i = self.index[node]
+        return self.names((self.reach[i] | self.reached_by[i]) & ~(1 << i))
+
+    def reachable(self, source: str, target: str) -> bool:
+        return bool(self.reach[self.index[source]] >> self.index[target] & 1)
+
+    def _counts(self, max_nodes: int) -> list[int]:
+        """Number of paths with at most max_nodes nodes starting at each node (DAG only)."""
+        counts = self._path_counts.get(max_nodes)
+        if counts is None:
+            n = len(self.nodes)
+            exact = [1] * n                             # Paths of exactly k nodes, k = 1
+            counts = list(exact)
+            for _ in range(max_nodes - 1):
+                exact = [sum(exact[j] for j in self.adjacency[i]) for i in range(n)]
+                if not any(exact):
+                    break
+                counts = [c + e for c, e in zip(counts, exact)]
+            self._path_counts[max_nodes] = counts
+        return counts
+
+    def count_branches(self, head: str, max_nodes: int | None = None) -> int:
+        """Number of branches from head (simple paths of two or more nodes), without listing them."""
+        if max_nodes is None:
+            max_nodes = len(self.nodes)
+        if self.is_dag:
+            return self._counts(max_nodes)[self.index[head]] - 1
+        return sum(1 for _ in self.iter_branches(head, max_nodes))
+
+    def branch_counts(self, max_nodes: int | None = None) -> dict[str, int]:
+        """Number of branches of each head, counted once per length limit."""
+        if max_nodes is None:
+            max_nodes = len(self.nodes)
+        counts = self._branch_counts.get(max_nodes)
+        if counts is None:
+            counts = {head: self.count_branches(head, max_nodes) for head in self.heads}
+            self._branch_counts[max_nodes] = counts
+        return counts
+
+    def iter_branches(self, head: str, max_nodes: int | None = None) -> Iterator[list[str]]:
+        """Branches from head in the order of find_all_branches, listed lazily.
+
+        Branches longer than max_nodes nodes are not followed."""
+        if max_nodes is None:
+            max_nodes = len(self.nodes)
+        start = self.index[head]
+        on_path = [False] * len(self.nodes)
+        on_path[start] = True
+        path = [start]
+        stack = [iter(self.adjacency[start])]
+        while stack:
+            neighbor = next(stack[-1], None)
+            if neighbor is None:
+                stack.pop()
+                if len(path) > 1:
+                    yield [self.nodes[i] for i in path]
+                on_path[path.pop()] = False
+            elif not on_path[neighbor] and len(path) < max_nodes:
+                on_path[neighbor] = True
+                path.append(neighbor)
+                stack.append(iter(self.adjacency[neighbor]))
+
+
+def generate_markers_dict(network_data: dict, index: ReachabilityIndex, max_nodes: int | None = None,
+                          max_branches: int | None = None) -> dict:
+    """The "Markers" section: all features, the head features and the branches of each head.
+
+    Branches are listed lazily, so only the requested ones are enumerated."""
+    branches_info = {}
+    for head_node in index.heads:
+        branches = islice(index.iter_branches(head_node, max_nodes), max_branches)
+        formatted = [f"10UG ({', '.join(branch)})" for branch in branches]
+        if formatted:  # Only include head nodes with valid branches
+            branches_info[head_node] = formatted
+
+    return {
+        "Combinations": [node['id'] for node in network_data.get("nodes", [])],
+        "Heads": index.heads,
+        "Branches": branches_info
+    }
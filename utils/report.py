@@ -0,0 +1,258 @@
+"""Word summaries built from a pre-styled template.
+
+The template holds one styled example of every part of a summary: the title
+paragraph ({filename}, {date}), and a table whose rows are a shaded
+({label}, {value}) row, an unshaded one, an image row ({image}) and the row
+shown without image ({no_image}). The parts are cut out once and every
+summary is made of deep copies of them, so no run or cell is styled while a
+report is built. Put a custom template in templates/summary.docx to change
+the layout; the default one is created in code.
+
+    python -m utils.report --date-from 01-03-2025 --date-to 07-03-2025 -o week.docx
+"""
+import argparse
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from copy import deepcopy
+from datetime import date
+from functools import lru_cache
+from io import BytesIO
+from pathlib import Path
+
+from docx import Document
+from docx.enum.text import WD_ALIGN_PARAGRAPH, WD_BREAK
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.shared import Mm, Pt, RGBColor
+from docx.table import Table
+
+from utils.export import date_argument, select_applications
+from utils.images import ensure_derivatives, print_size_mm
+from utils.storage import DATA_DIR, app_directory, load_summary
+
+TEMPLATE_PATH = Path("templates/summary.docx")
+REPORTS_DIR = DATA_DIR / "_reports"
+
+LABELS = [
+    "Independent Claims", "Ptbs", "Solution", "Technical Effect", "Keywords",
+    "Classes", "Remarks", "Unity", "Prior Art"
+]
+ROW_COLORS = ("D9EAF7", "FFFFFF")           # Light blue and white rows, alternating
+
+
+def _shading(color: str):
+    shading = OxmlElement('w:shd')
+    shading.set(qn('w:fill'), color)
+    return shading
+
+
+def _styled_run(paragraph, text: str, size: int, bold: bool = False):
+    run = paragraph.add_run(text)
+    run.font.name = "Arial"
+    run.font.size = Pt(size)
+    run.bold = bold
+    return run
+
+
+def default_template() -> bytes:
+    """The layout of the original single-application summary, as a template."""
+    document = Document()
+    section = document.sections[0]
+    section.page_height = Mm(297)
+    section.page_width = Mm(210)
+    document.core_properties.author = "Dr. St^2"
+
+    title = document.paragraphs[0] if document.paragraphs else document.add_paragraph()
+    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    _styled_run(title, "{filename}", 16, bold=True)
+    title.add_run("\t" * 7)
+    _styled_run(title, "{date}", 16, bold=True)
+
+    table = document.add_table(rows=0, cols=2)
+    table.style = "Table Grid"
+    for color in ROW_COLORS:
+        cells = table.add_row().cells
+        _styled_run(cells[0].paragraphs[0], "{label}", 14, bold=True)
+        cells[0].add_paragraph()                # Empty line under the label
+        _styled_run(cells[1].paragraphs[0], "{value}", 12)
+        for cell in cells:
+            cell._element.get_or_add_tcPr().append(_shading(color))
+
+    image_cells = table.add_row().cells
+    image_cells[0].merge(image_cells[1])
+    image_cells[0].paragraphs[0].add_run("{image}")
+    image_cells[0].paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    placeholder_cells = table.add_row().cells
+    placeholder_cells[0].merge(placeholder_cells[1])
+    run = _styled_run(placeholder_cells[0].paragraphs[0], "{no_image}", 12)
+    run.font.color.rgb = RGBColor(255, 0, 0)    # Red color for emphasis
+    placeholder_cells[0].paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    buffer = BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def _find_run(element, placeholder: str):
+    for run in element.iter(qn("w:r")):
+        if run.text == placeholder:
+            return run
+    raise ValueError(f"Template part without {placeholder}")
+
+
+def _fill(element, values: dict):
+    """Replaces the placeholder runs of a copied part in place."""
+    for run in element.iter(qn("w:r")):
+        text = run.text
+        if text.startswith("{") and text.endswith("}") and text[1:-1] in values:
+            run.text = values[text[1:-1]]       # Tabs and line breaks become w:tab / w:br
+    return element
+
+
+class ReportTemplate:
+    """Parts cut out of a template document once, cloned for every summary."""
+
+    def __init__(self, source: bytes):
+        self.source = source
+        document = Document(BytesIO(source))
+        title = next(p for p in document.paragraphs if "{filename}" in p.text)
+        self.title = deepcopy(title._p)
+
+        table = document.tables[0]
+        rows = [row._tr for row in table.rows]
+        if len(rows) < 4:
+            raise ValueError("The template table needs two value rows, an image row and a no-image row")
+        self.value_rows = [deepcopy(rows[0]), deepcopy(rows[1])]
+        self.image_row = deepcopy(rows[2])
+        self.no_image_row = deepcopy(rows[3])
+        self.table = deepcopy(table._tbl)
+        for tr in self.table.findall(qn("w:tr")):
+            self.table.remove(tr)
+
+    def new_document(self):
+        """Document with the template's styles and page setup and an empty body."""
+        document = Document(BytesIO(self.source))
+        body = document.element.body
+        for child in list(body):
+            if child.tag != qn("w:sectPr"):
+                body.remove(child)
+        return document
+
+
+@lru_cache(maxsize=1)
+def _template(path: str, mtime_ns: int) -> ReportTemplate:
+    source = Path(path).read_bytes() if path else default_template()
+    return ReportTemplate(source)
+
+
+def load_template() -> ReportTemplate:
+    """templates/summary.docx if present, else the default layout; loaded once per version."""
+    if TEMPLATE_PATH.is_file():
+        return _template(str(TEMPLATE_PATH), TEMPLATE_PATH.stat().st_mtime_ns)
+    return _template("", 0)
+
+
+def _append(document, element):
+    body = document.element.body
+    section = body.find(qn("w:sectPr"))
+    if section is not None:
+        section.addprevious(element)
+    else:
+        body.append(element)
+    return element
+
+
+def add_summary(document, template: ReportTemplate, filename: str, data: dict) -> None:
+    """Appends the summary of one application to document."""
+    _append(document, _fill(deepcopy(template.title), {"filename": filename, "date": f"{date.today()}"}))
+
+    tbl = _append(document, deepcopy(template.table))
+    for i, label in enumerate(LABELS):
+        tbl.append(_fill(deepcopy(template.value_rows[i % 2]), {"label": label, "value": str(data.get(label, ""))}))
+
+    # Print-sized derivative, already scaled to the box the document reserves
+    image_paths = ensure_derivatives(app_directory(filename), filename)
+    if image_paths:
+        tbl.append(deepcopy(template.image_row))
+        cell = Table(tbl, document._body).rows[-1].cells[0]
+        run = next(run for run in cell.paragraphs[0].runs if run.text == "{image}")
+        run.text = ""
+        width_mm, height_mm = print_size_mm(image_paths["print"])
+        run.add_picture(str(image_paths["print"]), width=Mm(width_mm), height=Mm(height_mm))
+    else:
+        tbl.append(_fill(deepcopy(template.no_image_row), {"no_image": "You did not provide an application image."}))
+
+
+def build_report(filenames: list[str], output: Path, progress=None) -> Path:
+    """One document with the summaries of all filenames, one page each."""
+    template = load_template()
+    document = template.new_document()
+    for i, filename in enumerate(filenames):
+        if i:
+            document.add_paragraph().add_run().add_break(WD_BREAK.PAGE)
+        add_summary(document, template, filename, load_summary(filename, derived=False))
+        if progress is not None:
+            progress(i + 1, len(filenames))
+    output.parent.mkdir(parents=True, exist_ok=True)
+    document.save(output)
+    return output
+
+
+def summary_docx_path(filename: str) -> Path:
+    return app_directory(filename) / f"Summary_{filename}.docx"
+
+
+def create_summary_docx(filename: str) -> Path:
+    return build_report([filename], summary_docx_path(filename))
+
+
+class ReportJob:
+    """A combined report being built by the report worker."""
+
+    def __init__(self, filenames: list[str], output: Path):
+        self.filenames = filenames
+        self.output = output
+        self.done = 0
+        self.future: Future | None = None
+
+    def _progress(self, done: int, total: int) -> None:
+        self.done = done
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def submit_report(filenames: list[str], output: Path) -> ReportJob:
+    """Builds a combined report in the background; reports are built one after the other."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="report")
+    job = ReportJob(list(filenames), output)
+    job.future = _executor.submit(build_report, job.filenames, output, job._progress)
+    return job
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Combined Word summary of several applications.")
+    parser.add_argument("--pattern", default="*", help="Application name pattern, e.g. 'EP23*'")
+    parser.add_argument("--date-from", type=date_argument, help="First date (DD-MM-YYYY)")
+    parser.add_argument("--date-to", type=date_argument, help="Last date (DD-MM-YYYY)")
+    parser.add_argument("--classes", default="", help="Text the \"Classes\" field must contain")
+    parser.add_argument("-o", "--output", type=Path, required=True)
+    args = parser.parse_args(argv)
+
+    filenames = select_applications(args.pattern, args.date_from, args.date_to, args.classes)
+    if not filenames:
+        print("No application matches.", file=sys.stderr)
+        return 1
+    build_report(filenames, args.output)
+    print(f"{len(filenames)} applications written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
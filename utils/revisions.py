@@ -0,0 +1,209 @@
+"""Revision history of the summaries.
+
+Every save of a summary records a revision under data/<NAME>/revisions/
+(background autosaves between two saves do not). Each section is stored once as a zlib-compressed JSON blob named after the
+SHA-256 of its content (objects/<2 hex>/<rest>), and the revision itself is a
+small manifest (manifests/<number>.json) mapping section names to blob hashes.
+Sections that did not change between saves point to the same blob, so the
+history costs little more than one compressed copy of the summary. Diffs
+between revisions compare hashes and only open the blobs that differ.
+
+    python -m utils.revisions AAA           # list the revisions of AAA
+"""
+import difflib
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import zlib
+from datetime import datetime
+from pathlib import Path
+
+REVISIONS_DIR = "revisions"
+
+
+def _canonical(value) -> bytes:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def content_hash(value) -> str:
+    """SHA-256 of the canonical JSON form of a value."""
+    return hashlib.sha256(_canonical(value)).hexdigest()
+
+
+def _blob_path(root: Path, digest: str) -> Path:
+    return root / "objects" / digest[:2] / digest[2:]
+
+
+def _write_file(path: Path, payload: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _manifests(root: Path) -> list[Path]:
+    """Manifest files, oldest first."""
+    directory = root / "manifests"
+    if not directory.is_dir():
+        return []
+    return sorted((path for path in directory.glob("*.json") if path.stem.isdigit()), key=lambda path: int(path.stem))
+
+
+def _read_manifest(path: Path) -> dict | None:
+    """The manifest, or None if it cannot be read (e.g. left behind by an older, crashed version)."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def _latest_manifest(root: Path) -> dict | None:
+    for path in reversed(_manifests(root)):
+        manifest = _read_manifest(path)
+        if manifest is not None:
+            return manifest
+    return None
+
+
+def record_revision(directory: Path, data: dict) -> str | None:
+    """Stores the sections of data as a new revision of the application in directory.
+
+    Returns the revision id, or None if nothing changed since the last revision."""
+    root = directory / REVISIONS_DIR
+    sections = {}
+    for key, value in data.items():
+        payload = _canonical(value)
+        digest = hashlib.sha256(payload).hexdigest()
+        blob = _blob_path(root, digest)
+        if not blob.exists():                       # Unchanged sections are already stored
+            _write_file(blob, zlib.compress(payload))
+        sections[key] = digest
+
+    latest = _latest_manifest(root)
+    if latest is not None and latest["sections"] == sections:
+        return None
+
+    manifests = _manifests(root)
+    number = int(manifests[-1].stem) + 1 if manifests else 1
+    manifest = {"time": datetime.now().isoformat(timespec="seconds"), "sections": sections}
+    directory = root / "manifests"
+    directory.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".manifest.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=4)
+        while True:
+            try:
+                # A complete file gets its number atomically; saves outside the file lock get their own number
+                os.link(tmp_path, directory / f"{number:06d}.json")
+                return f"{number:06d}"
+            except FileExistsError:
+                number += 1
+    finally:
+        os.unlink(tmp_path)
+
+
+def _root(filename: str) -> Path:
+    from utils.storage import app_directory
+    return app_directory(filename) / REVISIONS_DIR
+
+
+def list_revisions(filename: str) -> list[dict]:
+    """Revisions of an application, newest first: {"id", "time", "sections"}."""
+    revisions = []
+    for path in reversed(_manifests(_root(filename))):
+        manifest = _read_manifest(path)
+        if manifest is not None:
+            revisions.append({"id": path.stem, **manifest})
+    return revisions
+
+
+def _manifest(filename: str, revision_id: str) -> dict:
+    manifest = _read_manifest(_root(filename) / "manifests" / f"{revision_id}.json")
+    if manifest is None:
+        raise KeyError(f"{filename} has no revision {revision_id}")
+    return manifest
+
+
+def _load_blob(filename: str, digest: str):
+    return json.loads(zlib.decompress(_blob_path(_root(filename), digest).read_bytes()))
+
+
+def load_revision(filename: str, revision_id: str, keys=None) -> dict:
+    """The summary as it was saved in a revision; only the sections in keys if given."""
+    sections = _manifest(filename, revision_id)["sections"]
+    return {key: _load_blob(filename, digest) for key, digest in sections.items() if keys is None or key in keys}
+
+
+def diff_revisions(filename: str, old_id: str, new_id: str) -> dict:
+    """Section name -> "added", "removed" or "changed", from the manifests alone."""
+    old = _manifest(filename, old_id)["sections"]
+    new = _manifest(filename, new_id)["sections"]
+    changes = {}
+    for key in list(old) + [key for key in new if key not in old]:
+        if key not in new:
+            changes[key] = "removed"
+        elif key not in old:
+            changes[key] = "added"
+        elif old[key] != new[key]:
+            changes[key] = "changed"
+    return changes
+
+
+def section_diff(filename: str, old_id: str, new_id: str, key: str) -> str:
+    """Unified diff of one section between two revisions."""
+    old = load_revision(filename, old_id, {key}).get(key)
+    new = load_revision(filename, new_id, {key}).get(key)
+
+    def lines(value):
+        return [] if value is None else json.dumps(value, indent=2, ensure_ascii=False).splitlines()
+
+    return "\n".join(difflib.unified_diff(
+        lines(old), lines(new), fromfile=f"{key} @ {old_id}", tofile=f"{key} @ {new_id}", lineterm=""
+    ))
+
+
+def restore_revision(filename: str, revision_id: str) -> Path:
+    """Writes a revision back as the current summary; the restore is itself a new revision.
+
+    The indexes and background results fed by the Save buttons are updated as after a save."""
+    from utils.analytics import sync_application
+    from utils.graph import graph_from_network
+    from utils.graph_index import update_application
+    from utils.precompute import get_scheduler
+    from utils.storage import file_lock, write_summary
+    from utils.suggestions import update_suggestions
+
+    data = load_revision(filename, revision_id)
+    with file_lock(filename):
+        file_path = write_summary(filename, data)
+    update_application(filename, graph_from_network(data.get("Network", {})))
+    sync_application(filename)
+    update_suggestions(filename)
+    get_scheduler().schedule(filename)
+    return file_path
+
+
+def main(argv: list[str] | None = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 1:
+        print("usage: python -m utils.revisions NAME", file=sys.stderr)
+        return 2
+    filename = argv[0]
+    revisions = list_revisions(filename)
+    for newer, older in zip(revisions, revisions[1:] + [None]):
+        changes = diff_revisions(filename, older["id"], newer["id"]) if older else {key: "added" for key in newer["sections"]}
+        print(f"{newer['id']}  {newer['time']}  " + ", ".join(f"{key} ({status})" for key, status in changes.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
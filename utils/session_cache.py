@@ -0,0 +1,76 @@
+"""Per-application cache kept in the Streamlit session.
+
+Entries are keyed by application name, evicted least-recently-used and dropped
+as soon as the summary file changes on disk (mtime/size) or the cache layout
+version changes.
+"""
+from collections import OrderedDict
+
+import streamlit as st
+
+from utils.storage import load_section, summary_path
+
+CACHE_KEY = "app_cache"
+CACHE_VERSION = 1
+MAX_APPLICATIONS = 3
+
+
+def file_stamp(filename: str) -> tuple[int, int] | None:
+    try:
+        stat = summary_path(filename).stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class AppEntry:
+    """Cached sections and page state of one application."""
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.version = CACHE_VERSION
+        self.stamp = file_stamp(filename)
+        self._sections = {}
+        self.state = {}                             # Page working state, e.g. the packed graph
+
+    def is_current(self) -> bool:
+        return self.version == CACHE_VERSION and self.stamp == file_stamp(self.filename)
+
+    def _load(self, keys: list[str]) -> None:
+        missing = [key for key in keys if key not in self._sections]
+        if not missing:
+            return
+        # Read-only views shared with the process-wide summary cache; derived
+        # sections are read from their own sidecar file only when asked for
+        for key in missing:
+            self._sections[key] = load_section(self.filename, key)
+
+    def section(self, key: str, default=None):
+        """Returns one section of the summary, loading it on first use."""
+        self._load([key])
+        value = self._sections[key]
+        return default if value is None else value
+
+    def sections(self, keys: list[str]) -> dict:
+        """Returns the sections among keys that exist in the summary."""
+        self._load(keys)
+        return {key: self._sections[key] for key in keys if self._sections[key] is not None}
+
+
+def get_app_cache(filename: str) -> AppEntry:
+    """Returns the cache entry of an application, refreshing it if the file changed."""
+    cache = st.session_state.setdefault(CACHE_KEY, OrderedDict())
+
+    entry = cache.get(filename)
+    if entry is None or not entry.is_current():
+        entry = AppEntry(filename)
+        cache[filename] = entry
+
+    cache.move_to_end(filename)
+    while len(cache) > MAX_APPLICATIONS:
+        cache.popitem(last=False)
+    return entry
+
+
+def invalidate(filename: str) -> None:
+    st.session_state.get(CACHE_KEY, {}).pop(filename, None)
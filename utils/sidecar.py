@@ -0,0 +1,164 @@
+"""Binary sidecar files for the derived sections of a summary.
+
+The sections the pages compute again from the claims ("Feature Table",
+"Dataframes", "Concatenated DataFrame") are kept out of the human-readable
+Summary_<NAME>.json, one zstd-compressed Arrow IPC file per section under
+data/<NAME>/derived/. Sections are stored as columns: lists of features per
+claim and one string column per dataframe column. Values that do not fit a
+layout stay in the JSON file, as do the sections edited by the user
+("Edited Feature Table", "Network"); sidecars of these written by earlier
+versions are still read and move back into the JSON file on the next save.
+
+    python -m utils.sidecar        # move the sections of all summaries to their place
+"""
+import sys
+
+import pyarrow as pa
+
+COMPRESSION = "zstd"
+
+
+def _strings(values) -> bool:
+    return isinstance(values, list) and all(isinstance(value, str) for value in values)
+
+
+def _encode_lists(section):
+    """{"Cl_1": [str, ...], ...} -> one row per key."""
+    if not isinstance(section, dict) or not all(_strings(values) for values in section.values()):
+        return None
+    return pa.table({
+        "key": pa.array(list(section), pa.string()),
+        "values": pa.array(list(section.values()), pa.list_(pa.string())),
+    })
+
+
+def _decode_lists(table: pa.Table) -> dict:
+    return dict(zip(table["key"].to_pylist(), table["values"].to_pylist()))
+
+
+def _encode_columns(section):
+    """{"a_list": [...], "Cl_nr": [...]} -> one string column per key."""
+    if not isinstance(section, dict) or not all(_strings(values) for values in section.values()):
+        return None
+    if len({len(values) for values in section.values()}) > 1:
+        return None
+    return pa.table({key: pa.array(values, pa.string()) for key, values in section.items()})
+
+
+def _decode_columns(table: pa.Table) -> dict:
+    return table.to_pydict()
+
+
+def _encode_frames(section):
+    """{"Cl_1": {"a_list": [...], ...}, ...} -> one row per (key, column)."""
+    if not isinstance(section, dict) or not all(isinstance(frame, dict) for frame in section.values()):
+        return None
+    keys, columns, values = [], [], []
+    for key, frame in section.items():
+        if not frame or not all(_strings(column_values) for column_values in frame.values()):
+            return None
+        for column, column_values in frame.items():
+            keys.append(key)
+            columns.append(column)
+            values.append(column_values)
+    return pa.table({
+        "key": pa.array(keys, pa.string()),
+        "column": pa.array(columns, pa.string()),
+        "values": pa.array(values, pa.list_(pa.string())),
+    })
+
+
+def _decode_frames(table: pa.Table) -> dict:
+    frames = {}
+    for key, column, values in zip(*(table[name].to_pylist() for name in ("key", "column", "values"))):
+        frames.setdefault(key, {})[column] = values
+    return frames
+
+
+def _encode_network(section):
+    """Node table (id, color) and edge table (src, dst, label) in one row of list columns."""
+    if not isinstance(section, dict) or set(section) != {"nodes", "edges"}:
+        return None
+    nodes, edges = section["nodes"], section["edges"]
+    if not all(isinstance(node, dict) and set(node) == {"id", "color"} for node in nodes):
+        return None
+    if not all(isinstance(edge, dict) and set(edge) == {"source", "target", "label"} for edge in edges):
+        return None
+    ids = [node["id"] for node in nodes]
+    colors = [node["color"] for node in nodes]
+    labels = [edge["label"] for edge in edges]
+    index = {node_id: i for i, node_id in enumerate(ids)}
+    if len(index) != len(ids) or not _strings(ids) or not _strings(colors) or not _strings(labels):
+        return None
+    if not all(edge["source"] in index and edge["target"] in index for edge in edges):
+        return None
+    return pa.table({
+        "ids": pa.array([ids], pa.list_(pa.string())),
+        "colors": pa.array([colors], pa.list_(pa.string())),
+        "src": pa.array([[index[edge["source"]] for edge in edges]], pa.list_(pa.int32())),
+        "dst": pa.array([[index[edge["target"]] for edge in edges]], pa.list_(pa.int32())),
+        "labels": pa.array([labels], pa.list_(pa.string())),
+    })
+
+
+def _decode_network(table: pa.Table) -> dict:
+    row = {name: values[0] for name, values in table.to_pydict().items()}
+    ids = row["ids"]
+    return {
+        "nodes": [{"id": node_id, "color": color} for node_id, color in zip(ids, row["colors"])],
+        "edges": [
+            {"source": ids[u], "target": ids[v], "label": label}
+            for u, v, label in zip(row["src"], row["dst"], row["labels"])
+        ],
+    }
+
+
+# Section -> (file stem, encoder returning a table or None, decoder); also the
+# sidecars of earlier versions, which are read but no longer written
+SECTIONS = {
+    "Feature Table": ("feature_table", _encode_lists, _decode_lists),
+    "Edited Feature Table": ("edited_feature_table", _encode_lists, _decode_lists),
+    "Dataframes": ("dataframes", _encode_frames, _decode_frames),
+    "Concatenated DataFrame": ("concatenated_dataframe", _encode_columns, _decode_columns),
+    "Network": ("network", _encode_network, _decode_network),
+}
+DERIVED = ("Feature Table", "Dataframes", "Concatenated DataFrame")
+
+
+def encode(key: str, section) -> pa.Table | None:
+    """Columnar form of a section, or None if it has to stay in the JSON file."""
+    return SECTIONS[key][1](section)
+
+
+def decode(key: str, table: pa.Table):
+    return SECTIONS[key][2](table)
+
+
+def write_table(path, table: pa.Table) -> None:
+    options = pa.ipc.IpcWriteOptions(compression=COMPRESSION)
+    with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_file(sink, table.schema, options=options) as writer:
+        writer.write_table(table)
+
+
+def read_table(path) -> pa.Table:
+    with pa.memory_map(str(path), "r") as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def main(argv: list[str] | None = None) -> int:
+    from utils.storage import iter_applications, read_summary, sidecar_path, summary_path, write_summary
+
+    def stored_size(filename):
+        paths = [summary_path(filename)] + [sidecar_path(filename, key) for key in SECTIONS]
+        return sum(path.stat().st_size for path in paths if path.exists())
+
+    for filename in iter_applications():
+        before = stored_size(filename)
+        write_summary(filename, read_summary(filename))
+        print(f"{filename:<20}{before:>10} B -> {stored_size(filename):>8} B "
+              f"(JSON {summary_path(filename).stat().st_size} B)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterator
+
+import pyarrow as pa
+
+from utils import revisions, sidecar
+
+DATA_DIR = Path("data")
+
+# Parsed summaries and sidecars shared by all sessions, bounded by the size of their files
+SUMMARY_CACHE_BYTES = 32 * 2**20
+
+_file_locks = {}
+_file_locks_guard = threading.Lock()
+
+_summary_cache = OrderedDict()                      # path -> ((mtime_ns, size), frozen data or None)
+_summary_cache_bytes = 0
+_summary_cache_lock = threading.Lock()
+
+
+def app_directory(filename: str) -> Path:
+    return DATA_DIR / filename
+
+
+def summary_path(filename: str) -> Path:
+    return app_directory(filename) / f"Summary_{filename}.json"
+
+
+def iter_applications() -> Iterator[str]:
+    """Yields the names of all applications that have a summary file, sorted."""
+    if not DATA_DIR.is_dir():
+        return
+    for directory in sorted(DATA_DIR.iterdir()):
+        if directory.is_dir() and (directory / f"Summary_{directory.name}.json").is_file():
+            yield directory.name
+
+
+def _readonly(self, *args, **kwargs):
+    raise TypeError("Cached summaries are read-only, use read_summary() for a copy")
+
+
+class FrozenDict(dict):
+    """dict that refuses changes; still a dict for json, pandas and ==."""
+
+    __setitem__ = __delitem__ = __ior__ = clear = pop = popitem = setdefault = update = _readonly
+
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+
+class FrozenList(list):
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _readonly
+    append = extend = insert = pop = remove = clear = sort = reverse = _readonly
+
+    def __copy__(self):
+        return list(self)
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+
+def freeze(value):
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return FrozenList(freeze(item) for item in value)
+    return value
+
+
+def thaw(value):
+    """Mutable deep copy of a frozen value."""
+    if isinstance(value, dict):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [thaw(item) for item in value]
+    return value
+
+
+def _parse_json(file_path: Path) -> FrozenDict:
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        data = {}
+    return freeze(data) if isinstance(data, dict) else FrozenDict()
+
+
+def _sidecar_parser(key: str):
+    def parse(file_path: Path):
+        try:
+            return freeze(sidecar.decode(key, sidecar.read_table(file_path)))
+        except (OSError, pa.ArrowException, KeyError, IndexError):
+            return None                             # Unreadable sidecar: treated as missing
+    return parse
+
+
+def _evict(path: Path) -> None:
+    global _summary_cache_bytes
+    entry = _summary_cache.pop(path, None)
+    if entry is not None:
+        _summary_cache_bytes -= entry[0][1]
+
+
+def _cached(file_path: Path, parse):
+    """Parsed content of file_path, parsed again only when its mtime or size changed; None if missing."""
+    global _summary_cache_bytes
+    try:
+        stat = file_path.stat()                     # Stat before reading, so a newer file is never cached as older
+    except FileNotFoundError:
+        return None
+    stamp = (stat.st_mtime_ns, stat.st_size)
+
+    with _summary_cache_lock:
+        entry = _summary_cache.get(file_path)
+        if entry is not None and entry[0] == stamp:
+            _summary_cache.move_to_end(file_path)
+            return entry[1]
+
+    data = parse(file_path)
+    with _summary_cache_lock:
+        _evict(file_path)
+        _summary_cache[file_path] = (stamp, data)
+        _summary_cache_bytes += stamp[1]
+        while _summary_cache_bytes > SUMMARY_CACHE_BYTES and len(_summary_cache) > 1:
+            _evict(next(iter(_summary_cache)))
+    return data
+
+
+def sidecar_path(filename: str, key: str) -> Path:
+    return app_directory(filename) / "derived" / f"{sidecar.SECTIONS[key][0]}.arrow"
+
+
+def _load_sidecar(filename: str, key: str):
+    return _cached(sidecar_path(filename, key), _sidecar_parser(key))
+
+
+def load_section(filename: str, key: str, default=None):
+    """Read-only view of one section. Derived sections are read from their sidecar
+    only, unless the JSON file still holds them (summaries written before the sidecars)."""
+    data = _cached(summary_path(filename), _parse_json)
+    if data is None:
+        return default
+    if key in data or key not in sidecar.SECTIONS:
+        return data.get(key, default)
+    value = _load_sidecar(filename, key)
+    return default if value is None else value
+
+
+def load_summary(filename: str, derived: bool = True) -> FrozenDict:
+    """Read-only view of Summary_<filename>.json, parsed once per change of the file.
+
+    With derived=False the sections kept in sidecar files are left out. Views are
+    shared between sessions: read_summary() returns a copy to modify."""
+    data = _cached(summary_path(filename), _parse_json)
+    if data is None:
+        return FrozenDict()
+    if not derived:
+        return data
+    sections = {}
+    for key in sidecar.SECTIONS:
+        if key not in data:
+            value = _load_sidecar(filename, key)
+            if value is not None:
+                sections[key] = value
+    return FrozenDict({**data, **sections}) if sections else data
+
+
+def read_summary(filename: str) -> dict:
+    """Loads Summary_<filename>.json with its derived sections, returning {} if it is missing or corrupted."""
+    return thaw(load_summary(filename))
+
+
+def invalidate_summary(filename: str) -> None:
+    with _summary_cache_lock:
+        _evict(summary_path(filename))
+        for key in sidecar.SECTIONS:
+            _evict(sidecar_path(filename, key))
+
+
+def file_lock(filename: str) -> threading.Lock:
+    """Process-wide lock serializing read-modify-write cycles on one summary."""
+    with _file_locks_guard:
+        return _file_locks.setdefault(filename, threading.Lock())
+
+
+def _replace_atomically(file_path: Path, write) -> None:
+    """Writes a file through write(tmp_path) and renames it into place."""
+    fd, tmp_path = tempfile.mkstemp(dir=file_path.parent, prefix=f".{file_path.name}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.chmod(tmp_path, 0o644)                   # mkstemp creates owner-only files
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _write_json(data: dict):
+    def write(tmp_path):
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4, ensure_ascii=False)
+    return write
+
+
+def write_summary(filename: str, data: dict, revision: bool = True) -> Path:
+    """Writes Summary_<filename>.json atomically (temporary file + rename).
+
+    Derived sections go to their sidecar files (rewritten only when changed);
+    the JSON file keeps the other sections and any derived section that has
+    no columnar form. A write that changes something is kept as a revision,
+    unless revision is False (background autosaves between two saves)."""
+    file_path = summary_path(filename)
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        in_sidecar = set()
+        stale = []
+        for key in sidecar.SECTIONS:
+            path = sidecar_path(filename, key)
+            if key in data and key in sidecar.DERIVED:
+                if path.exists() and _load_sidecar(filename, key) == data[key]:
+                    in_sidecar.add(key)
+                    continue
+                table = sidecar.encode(key, data[key])
+                if table is not None:
+                    path.parent.mkdir(exist_ok=True)
+                    _replace_atomically(path, lambda tmp_path: sidecar.write_table(tmp_path, table))
+                    in_sidecar.add(key)
+                    continue
+            stale.append(path)
+
+        _replace_atomically(file_path, _write_json({key: value for key, value in data.items() if key not in in_sidecar}))
+        for path in stale:                          # Only once the JSON file holds their sections
+            path.unlink(missing_ok=True)
+        if revision:
+            revisions.record_revision(file_path.parent, data)
+    finally:
+        invalidate_summary(filename)
+    return file_path
+
+
+def update_sections(filename: str, sections: dict, revision: bool = True) -> Path:
+    """Merges sections into the stored summary under the file lock."""
+    with file_lock(filename):
+        data = read_summary(filename)
+        data.update(sections)
+        return write_summary(filename, data, revision)
@@ -0,0 +1,219 @@
+"""Keywords and Classes suggestions from feature co-occurrence in the archive.
+
+Two sparse count matrices, feature × class and feature × keyword, count the
+applications in which a canonical feature of the "Edited Feature Table" and a
+classification (or keyword) were saved together. They are stored in CSR form
+as .npy files under data/_index/cooccurrence/ and read memory-mapped, so a
+suggestion is one slice per feature of the application and a bincount.
+
+Syncing only re-reads summaries whose mtime or size changed; the per-application
+sets are kept in state.json and the matrices are rebuilt from them.
+
+    python -m utils.suggestions             # bring the matrices up to date
+    python -m utils.suggestions AAA         # suggestions for one application
+"""
+import json
+import os
+import re
+import sys
+import threading
+from functools import lru_cache
+
+import numpy as np
+
+from utils.analytics import split_classes
+from utils.storage import DATA_DIR, iter_applications, load_summary, summary_path
+from utils.vocabulary import normalize
+
+INDEX_DIR = DATA_DIR / "_index" / "cooccurrence"
+STATE_PATH = INDEX_DIR / "state.json"
+STATE_VERSION = 1
+KINDS = ("classes", "keywords")
+
+_lock = threading.Lock()
+
+
+def split_keywords(keywords: str) -> list[str]:
+    """'Wheel hub, torque; sensor' -> ['wheel hub', 'torque', 'sensor']"""
+    return [k.strip().lower() for k in re.split(r"[,;\n]", str(keywords or "")) if k.strip()]
+
+
+def _stamp(filename: str) -> list[int] | None:
+    try:
+        stat = summary_path(filename).stat()
+    except FileNotFoundError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def application_terms(data: dict) -> dict:
+    """Canonical features, classes and keywords of one summary, each sorted and unique."""
+    features = {
+        normalize(feature)
+        for claim_features in data.get("Edited Feature Table", {}).values()
+        for feature in claim_features
+        if isinstance(feature, str)
+    }
+    return {
+        "features": sorted(features - {""}),
+        "classes": sorted(set(split_classes(data.get("Classes", "")))),
+        "keywords": sorted(set(split_keywords(data.get("Keywords", "")))),
+    }
+
+
+def _empty_state() -> dict:
+    return {"version": STATE_VERSION, "apps": {}}
+
+
+def _read_state() -> dict:
+    try:
+        with open(STATE_PATH, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return _empty_state()
+    return state if state.get("version") == STATE_VERSION else _empty_state()
+
+
+def _save_npy(name: str, array: np.ndarray) -> None:
+    tmp_path = INDEX_DIR / f".{name}.tmp.npy"
+    np.save(tmp_path, array)
+    os.replace(tmp_path, INDEX_DIR / f"{name}.npy")  # Open memory maps keep the old file
+
+
+def _build(state: dict) -> None:
+    """Writes the CSR matrices and the row/column labels for the application sets in state."""
+    apps = state["apps"].values()
+    features = sorted({term for app in apps for term in app["features"]})
+    row = {term: i for i, term in enumerate(features)}
+    labels = {"features": features}
+    for kind in KINDS:
+        columns = sorted({term for app in apps for term in app[kind]})
+        column = {term: j for j, term in enumerate(columns)}
+        pairs = [
+            np.add.outer(
+                np.array([row[t] for t in app["features"]], dtype=np.int64) * len(columns),
+                np.array([column[t] for t in app[kind]], dtype=np.int64),
+            ).ravel()
+            for app in apps if app["features"] and app[kind]
+        ]
+        keys, counts = np.unique(np.concatenate(pairs), return_counts=True) if pairs else (np.empty(0, np.int64), np.empty(0, np.int64))
+        rows, cols = np.divmod(keys, max(len(columns), 1))
+        _save_npy(f"{kind}_indptr", np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=len(features)))]).astype(np.int64))
+        _save_npy(f"{kind}_indices", cols.astype(np.int32))
+        _save_npy(f"{kind}_counts", counts.astype(np.int32))
+        labels[kind] = columns
+    tmp_path = INDEX_DIR / ".labels.json.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(labels, f, ensure_ascii=False)
+    os.replace(tmp_path, INDEX_DIR / "labels.json")
+
+
+def _write_state(state: dict) -> None:
+    tmp_path = STATE_PATH.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp_path, STATE_PATH)
+
+
+def _save_state(state: dict) -> None:
+    INDEX_DIR.mkdir(parents=True, exist_ok=True)
+    _build(state)
+    _write_state(state)                             # Written last: marks the matrices as current
+
+
+def update_suggestions(filename: str) -> None:
+    """Replaces the contribution of one application, e.g. right after it was saved."""
+    with _lock:
+        state = _read_state()
+        old = state["apps"].get(filename)
+        terms = application_terms(load_summary(filename))
+        state["apps"][filename] = {"stamp": _stamp(filename), **terms}
+        if old is None or any(old[key] != terms[key] for key in terms) or not STATE_PATH.is_file():
+            _save_state(state)
+        else:
+            _write_state(state)                     # Only the stamp changed
+
+
+def sync_cooccurrence() -> int:
+    """Brings the matrices up to date with all summaries; returns the number of changed applications."""
+    with _lock:
+        state = _read_state()
+        names = set(iter_applications())
+        changed = 0
+        for filename in list(state["apps"]):
+            if filename not in names:
+                del state["apps"][filename]
+                changed += 1
+        for filename in sorted(names):
+            stamp = _stamp(filename)
+            entry = state["apps"].get(filename)
+            if entry and entry["stamp"] == stamp:
+                continue
+            state["apps"][filename] = {"stamp": stamp, **application_terms(load_summary(filename))}
+            changed += 1
+        if changed or not STATE_PATH.is_file():
+            _save_state(state)
+        return changed
+
+
+@lru_cache(maxsize=1)
+def _load(mtime_ns: int) -> dict:
+    with open(INDEX_DIR / "labels.json", "r", encoding="utf-8") as f:
+        labels = json.load(f)
+    model = {"row": {term: i for i, term in enumerate(labels["features"])}, "apps": _read_state()["apps"]}
+    for kind in KINDS:
+        model[kind] = {
+            "labels": labels[kind],
+            "column": {term: j for j, term in enumerate(labels[kind])},
+            **{part: np.load(INDEX_DIR / f"{kind}_{part}.npy", mmap_mode="r") for part in ("indptr", "indices", "counts")},
+        }
+    return model
+
+
+def load_model() -> dict:
+    if not STATE_PATH.is_file():
+        sync_cooccurrence()                         # First use: index the whole archive once
+    return _load(STATE_PATH.stat().st_mtime_ns)
+
+
+def suggest(filename: str, features: list[str], kind: str, exclude: list[str] = (), top: int = 8) -> list[tuple[str, int]]:
+    """Classes or keywords most often saved with these features, as (term, count).
+
+    The application's own saved contribution is left out of the counts."""
+    model = load_model()
+    matrix = model[kind]
+    terms = set(map(normalize, features))
+    rows = sorted(model["row"][term] for term in terms if term in model["row"])
+    if not rows or not matrix["labels"]:
+        return []
+    indptr, indices, counts = matrix["indptr"], matrix["indices"], matrix["counts"]
+    columns = np.concatenate([indices[indptr[i]:indptr[i + 1]] for i in rows])
+    weights = np.concatenate([counts[indptr[i]:indptr[i + 1]] for i in rows])
+    scores = np.bincount(columns, weights=weights, minlength=len(matrix["labels"]))
+
+    own = model["apps"].get(filename)
+    if own:
+        shared = len(terms.intersection(own["features"]))
+        for term in own[kind]:
+            scores[matrix["column"][term]] -= shared
+
+    excluded = {matrix["column"][term] for term in exclude if term in matrix["column"]}
+    ranked = [j for j in np.argsort(-scores, kind="stable") if scores[j] > 0 and j not in excluded]
+    return [(matrix["labels"][j], int(scores[j])) for j in ranked[:top]]
+
+
+def main(argv: list[str] | None = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    changed = sync_cooccurrence()
+    if not argv:
+        print(f"Updated {changed} applications in {INDEX_DIR}")
+        return 0
+    data = load_summary(argv[0])
+    features = [feature for claim_features in data.get("Edited Feature Table", {}).values() for feature in claim_features]
+    for kind in KINDS:
+        print(f"{kind}: " + ", ".join(f"{term} ({count})" for term, count in suggest(argv[0], features, kind)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""Canonical feature vocabulary.
+
+Features are normalized once (determiner, case, whitespace, plural of the head
+noun) and mapped to compact integer IDs. Surface forms are kept for display only.
+Determiners are known for English, German and French claims; the plural rules
+are English ones.
+"""
+import json
+import re
+from collections import Counter
+from pathlib import Path
+
+from utils.storage import DATA_DIR, app_directory
+
+DEFAULT_LANGUAGE = "en"
+
+# Determiners of introduced features and of back references, per claim language
+DETERMINERS = {
+    "en": (("a", "an"), ("the", "said")),
+    "de": (("ein", "eine", "einen", "einem", "einer", "eines"),
+           ("der", "die", "das", "den", "dem", "des", "besagte", "besagten", "besagter", "besagtes")),
+    "fr": (("un", "une", "des"), ("le", "la", "les", "l'", "ledit", "ladite", "lesdits", "lesdites")),
+}
+INDEFINITE, DEFINITE = DETERMINERS[DEFAULT_LANGUAGE]
+
+# Frequent function words of claims; words shared between the languages are left out
+FUNCTION_WORDS = {
+    "en": {"the", "a", "an", "of", "and", "wherein", "which", "is", "are", "to", "with", "said", "comprising", "for", "claim"},
+    "de": {"der", "die", "das", "ein", "eine", "einen", "einer", "eines", "und", "wobei", "mit", "ist", "zum", "zur", "nach", "anspruch", "dadurch"},
+    "fr": {"le", "la", "les", "un", "une", "des", "du", "et", "dans", "selon", "caractérisé", "revendication", "au", "aux", "est"},
+}
+WORD = re.compile(r"[^\W\d_]+")
+
+# Words whose trailing "s" is not a plural ending
+NON_PLURAL_ENDINGS = ("ss", "us", "is", "ics")
+
+# Nouns that end in "s" in the singular, or are the same in singular and plural
+INVARIANT_NOUNS = {"means", "series", "species", "lens", "bias", "gas", "canvas", "atlas", "chassis", "headquarters"}
+
+
+def detect_language(text: str) -> str:
+    """'en', 'de' or 'fr', whichever has the most function words in text."""
+    words = Counter(word.lower() for word in WORD.findall(text))
+    scores = {language: sum(words[word] for word in vocabulary) for language, vocabulary in FUNCTION_WORDS.items()}
+    language = max(scores, key=scores.get)
+    return language if scores[language] > scores[DEFAULT_LANGUAGE] else DEFAULT_LANGUAGE
+
+
+def split_determiner(phrase: str, language: str = DEFAULT_LANGUAGE) -> tuple[str, str]:
+    """'The  wheel adapter' -> ('the', 'wheel adapter'); "l'élément" -> ("l'", 'élément')"""
+    indefinite, definite = DETERMINERS[language]
+    words = phrase.split()
+    if words and words[0].lower() in indefinite + definite:
+        return words[0].lower(), " ".join(words[1:])
+    if words and language == "fr" and words[0].lower().startswith(("l'", "l’")):
+        return "l'", " ".join([words[0][2:]] + words[1:])
+    return "", " ".join(words)
+
+
+def determiner_kind(phrase: str, language: str = DEFAULT_LANGUAGE) -> str:
+    """'a' for introduced features, 'the' for back references, '' otherwise."""
+    indefinite, definite = DETERMINERS[language]
+    determiner, _ = split_determiner(phrase, language)
+    if determiner in indefinite:
+        return "a"
+    if determiner in definite:
+        return "the"
+    return ""
+
+
+def is_back_reference(phrase: str, language: str = DEFAULT_LANGUAGE) -> bool:
+    return determiner_kind(phrase, language) == "the"
+
+
+def singularize(word: str) -> str:
+    if len(word) <= 3 or not word.endswith("s") or word.endswith(NON_PLURAL_ENDINGS) or word in INVARIANT_NOUNS:
+        return word
+    if word.endswith("es") and word[:-2] in INVARIANT_NOUNS:  # lenses, biases
+        return word[:-2]
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("sses", "xes", "ches", "shes", "zes")):
+        return word[:-2]
+    return word[:-1]
+
+
+def normalize(phrase: str) -> str:
+    """Canonical form of a feature: no determiner, lower case, single spaces, singular head noun."""
+    _, rest = split_determiner(phrase)
+    words = re.sub(r"\s+", " ", rest).strip().lower().split(" ")
+    if not words or not words[0]:
+        return ""
+    words[-1] = singularize(words[-1])
+    return " ".join(words)
+
+
+class FeatureVocabulary:
+    """Maps canonical features to integer IDs and keeps the first surface form of each."""
+
+    def __init__(self, path: Path | None = None):
+        self.path = path
+        self.ids = {}                               # canonical -> ID
+        self.surfaces = []                          # ID -> display form
+
+    def __len__(self):
+        return len(self.surfaces)
+
+    def intern(self, phrase: str) -> int | None:
+        """Returns the ID of phrase, adding it if new. Empty phrases have no ID."""
+        canonical = normalize(phrase)
+        if not canonical:
+            return None
+        feature_id = self.ids.get(canonical)
+        if feature_id is None:
+            feature_id = len(self.surfaces)
+            self.ids[canonical] = feature_id
+            self.surfaces.append(split_determiner(phrase)[1].strip())
+        return feature_id
+
+    def id_of(self, phrase: str) -> int | None:
+        return self.ids.get(normalize(phrase))
+
+    def surface(self, feature_id: int) -> str:
+        return self.surfaces[feature_id]
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"surfaces": self.surfaces, "canonical": list(self.ids)}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: Path) -> "FeatureVocabulary":
+        vocabulary = cls(path)
+        if path.is_file():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    stored = json.load(f)
+                vocabulary.surfaces = stored["surfaces"]
+                vocabulary.ids = {canonical: i for i, canonical in enumerate(stored["canonical"])}
+            except (json.JSONDecodeError, KeyError):
+                vocabulary = cls(path)
+        return vocabulary
+
+
+def vocabulary_path(filename: str | None = None) -> Path:
+    """Per-application vocabulary, or the global one shared by all applications."""
+    if filename is None:
+        return DATA_DIR / "_index" / "vocabulary.json"
+    return app_directory(filename) / f"vocabulary_{filename}.json"
+
+
+def load_vocabulary(filename: str | None = None) -> FeatureVocabulary:
+    return FeatureVocabulary.load(vocabulary_path(filename))